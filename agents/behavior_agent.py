@@ -31,7 +31,7 @@ class SenderHistory:
     reply_to_addresses: List[str]
 
 
-@dataclass 
+@dataclass(slots=True, frozen=True)
 class BehaviorAnalysisResult:
     """Result of behavior analysis."""
     sender_reputation: str
@@ -42,6 +42,10 @@ class BehaviorAnalysisResult:
     score: float
     confidence: float
     details: str
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Shallow dict of the result fields (cheaper than dataclasses.asdict)."""
+        return {name: getattr(self, name) for name in self.__slots__}
 
 
 class EmailStore:
@@ -61,26 +65,40 @@ class EmailStore:
 
 
 class SQLiteEmailStore(EmailStore):
-    """SQLite-based email storage."""
+    """SQLite-based email storage over one long-lived connection."""
+    
+    # WAL lets reads proceed during writes, and NORMAL sync skips the fsync on
+    # every commit while staying corruption-safe; callers may override
+    DEFAULT_PRAGMAS = {"journal_mode": "WAL", "synchronous": "NORMAL", "temp_store": "MEMORY"}
     
-    def __init__(self, db_path: str = "data/email_behavior.db"):
+    def __init__(self, db_path: str = "data/email_behavior.db", pragmas: Optional[Dict[str, str]] = None):
         self.db_path = db_path
+        self.pragmas = {**self.DEFAULT_PRAGMAS, **(pragmas or {})}
         self._db = None
+        # Concurrent first calls must share one connection, not each open one
+        self._connect_lock = asyncio.Lock()
     
     async def _get_connection(self):
         """Get database connection."""
         if self._db is None:
-            # Ensure directory exists
-            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
-            
-            self._db = await aiosqlite.connect(self.db_path)
-            await self._create_tables()
+            async with self._connect_lock:
+                if self._db is None:
+                    # Ensure directory exists (":memory:" has none)
+                    db_dir = os.path.dirname(self.db_path)
+                    if db_dir:
+                        os.makedirs(db_dir, exist_ok=True)
+                    
+                    db = await aiosqlite.connect(self.db_path)
+                    # Connection-level settings, e.g. journal_mode or synchronous
+                    for name, value in self.pragmas.items():
+                        await db.execute(f"PRAGMA {name}={value}")
+                    await self._create_tables(db)
+                    # Published only once ready, so no caller sees a half-set-up connection
+                    self._db = db
         return self._db
     
-    async def _create_tables(self):
+    async def _create_tables(self, db):
         """Create database tables."""
-        db = await self._get_connection()
-        
         await db.execute("""
             CREATE TABLE IF NOT EXISTS sender_history (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -153,8 +171,9 @@ class SQLiteEmailStore(EmailStore):
         await db.commit()
     
     async def close(self):
-        """Close SQLite connection."""
+        """Close SQLite connection, folding the WAL back into the database file."""
         if self._db:
+            await self._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
             await self._db.close()
             self._db = None
 
@@ -480,7 +499,7 @@ def create_email_store(store_type: str = "sqlite", **kwargs) -> EmailStore:
     """Create email storage backend."""
     if store_type.lower() == "sqlite":
         db_path = kwargs.get("db_path", "data/email_behavior.db")
-        return SQLiteEmailStore(db_path)
+        return SQLiteEmailStore(db_path, pragmas=kwargs.get("pragmas"))
     elif store_type.lower() == "redis":
         # Redis is currently disabled due to aioredis Python 3.11+ compatibility issues
         # Falling back to SQLite storage
@@ -553,20 +572,6 @@ class BehaviorAgent:
         # Analyze behavior
         result = await agent.analyze_behavior(email_data, store)
         
-        # Convert to legacy format
-        from dataclasses import dataclass
-        
-        @dataclass
-        class BehaviorAnalysisResultLegacy:
-            sender_reputation: str
-            timing_anomalies: List[str]
-            header_anomalies: List[str]
-            authentication_issues: List[str]
-            spoofing_indicators: List[str]
-            score: float
-            confidence: float
-            details: str
-        
         # Extract legacy data from new format
         reasons = result['reasons']
         score = result['score']
@@ -586,7 +591,7 @@ class BehaviorAgent:
         else:
             reputation = "established"
         
-        return BehaviorAnalysisResultLegacy(
+        return BehaviorAnalysisResult(
             sender_reputation=reputation,
             timing_anomalies=timing_anomalies,
             header_anomalies=header_anomalies,
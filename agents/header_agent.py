@@ -59,6 +59,8 @@ class EnhancedHeaderAgent:
         self.suspicious_tlds = [
             '.ru', '.cn', '.tk', '.ml', '.ga', '.cf', '.gq', '.cc', '.pw'
         ]
+        # Same TLDs without the dot, for exact matches on tldextract suffixes
+        self._suspicious_suffixes = frozenset(tld.lstrip('.') for tld in self.suspicious_tlds)
         
         # Common bulk email/spam indicators in routing
         self.bulk_indicators = [
@@ -77,14 +79,16 @@ class EnhancedHeaderAgent:
             email_headers: Dictionary of email headers
             
         Returns:
-            Dict with score, verdict, routing_analysis, and details
+            Dict with score, verdict, routing_analysis, reasons, details and confidence
         """
         if not email_headers:
             return {
                 'score': 0.0,
                 'verdict': 'normal',
                 'routing_analysis': None,
-                'details': 'No headers to analyze'
+                'reasons': [],
+                'details': 'No headers to analyze',
+                'confidence': 0.5
             }
         
         reasons = []
@@ -438,7 +442,7 @@ class EnhancedHeaderAgent:
         for hop in routing.route_hops:
             try:
                 extracted = tldextract.extract(hop.server)
-                if extracted.suffix in [tld.lstrip('.') for tld in self.suspicious_tlds]:
+                if extracted.suffix in self._suspicious_suffixes:
                     suspicious_countries.append(extracted.suffix)
             except Exception:
                 pass
@@ -606,6 +610,13 @@ class EnhancedHeaderAgent:
         return ". ".join(details)
 
 
+def _routing_to_dict(routing_analysis: RoutingAnalysis) -> Dict[str, Any]:
+    """Flatten a RoutingAnalysis into plain dicts (shallow, no deep copies)."""
+    routing_dict = dict(routing_analysis.__dict__)
+    routing_dict['route_hops'] = [dict(hop.__dict__) for hop in routing_analysis.route_hops]
+    return routing_dict
+
+
 # Global instance for performance
 _header_agent = None
 
@@ -652,5 +663,10 @@ class HeaderAgent:
         # Analyze headers
         result = await agent.analyze_headers(headers)
         
-        # Return dictionary format for consistency with orchestrator
+        # Return dictionary format for consistency with orchestrator,
+        # including the routing analysis so callers don't convert it per request
+        routing_analysis = result.get('routing_analysis')
+        if routing_analysis is not None:
+            result['routing_analysis'] = _routing_to_dict(routing_analysis)
+        
         return result
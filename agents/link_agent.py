@@ -4,8 +4,10 @@ Enhanced Link Agent for analyzing URLs with sophisticated detection techniques.
 
 import re
 import asyncio
+import time
+import unicodedata
 import urllib.parse
-from typing import Dict, List, Any, Tuple, Optional
+from typing import Dict, List, Any, Tuple, Optional, Set
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 import warnings
@@ -25,6 +27,116 @@ from confusable_homoglyphs import confusables
 # Suppress warnings for cleaner output
 warnings.filterwarnings('ignore')
 
+# WHOIS creation dates shared by every lookup: domain -> (fetched_at, creation_date).
+# Registration dates don't change, so a day-long TTL only bounds staleness for
+# re-registered domains.
+_WHOIS_CACHE: Dict[str, Tuple[float, Optional[datetime]]] = {}
+_WHOIS_CACHE_TTL = 86400.0
+_WHOIS_CACHE_SIZE = 10_000
+
+# Bound on the per-agent closest-allowlist-domain cache
+_SIMILARITY_CACHE_SIZE = 100_000
+
+# URL patterns for free-text extraction. They are scanned separately, not as
+# one alternation: each has a literal prefix the regex engine can search for,
+# and www. links nested inside http(s) URLs are still picked up on their own.
+_URL_PATTERNS = tuple(re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'https?://[^\s<>"\'`]+',  # Standard HTTP/HTTPS URLs
+    r'www\.[^\s<>"\'`]+',      # www. URLs without protocol
+    r'ftp://[^\s<>"\'`]+',     # FTP URLs
+))
+_TRAILING_PUNCT_RE = re.compile(r'[.,;!?)\]}>"\']$')
+
+# Characters folded together when comparing how domains look rather than how
+# they are spelled: digits and pipes that pass for letters, and i/l, which are
+# indistinguishable in many fonts (and "paypaI" lowercases to "paypai")
+_LOOKALIKE_TABLE = str.maketrans({'0': 'o', '1': 'l', 'i': 'l', '|': 'l', '3': 'e', '5': 's'})
+
+# Non-ASCII characters commonly passed off as Latin letters; fills gaps in the
+# Unicode confusables data, which maps some of these only to other non-ASCII forms
+_HOMOGLYPHS = {
+    'a': ['а', 'α', 'à', 'á', 'â', 'ã', 'ä', 'å'],
+    'e': ['е', 'ë', 'è', 'é', 'ê', 'ε'],
+    'i': ['і', 'ï', 'ì', 'í', 'î', 'ι'],
+    'o': ['о', 'ο', 'ò', 'ó', 'ô', 'õ', 'ö'],
+    'u': ['υ', 'ù', 'ú', 'û', 'ü'],
+    'p': ['р', 'ρ'],
+    'c': ['с', 'ç'],
+    'x': ['х', 'χ'],
+    'y': ['у', 'ý', 'ÿ'],
+    'n': ['п'],
+    'm': ['м'],
+    'h': ['һ'],
+    'k': ['κ'],
+    't': ['τ'],
+    'b': ['в'],
+    'g': ['ց'],
+    'l': ['ǀ'],
+}
+
+
+def _build_confusable_table() -> Dict[int, str]:
+    """
+    Map non-ASCII characters to the ASCII they pass for, in the spirit of the
+    Unicode TR39 skeleton: accented Latin letters lose their marks, Unicode
+    confusables fold to an ASCII prototype, and _HOMOGLYPHS fills the gaps.
+    """
+    table = {}
+    
+    # Latin-1 Supplement through Latin Extended-B
+    for code in range(0xC0, 0x250):
+        base = ''.join(c for c in unicodedata.normalize('NFKD', chr(code)) if not unicodedata.combining(c))
+        if base.isascii() and base.isalnum():
+            table[code] = base.lower()
+    
+    for char, homoglyphs in confusables.confusables_data.items():
+        if len(char) != 1 or char.isascii():
+            continue
+        for homoglyph in homoglyphs:
+            target = homoglyph['c']
+            if len(target) == 1 and target.isascii() and target.isalnum():
+                table.setdefault(ord(char), target.lower())
+                break
+    
+    for target, chars in _HOMOGLYPHS.items():
+        for char in chars:
+            table[ord(char)] = target
+    
+    return table
+
+
+# Non-ASCII lookalike -> ASCII, and the full skeleton fold that also applies
+# the ASCII lookalikes above to both the source characters and the results
+_CONFUSABLE_TABLE = _build_confusable_table()
+_SKELETON_TABLE = {
+    **{code: target.translate(_LOOKALIKE_TABLE) for code, target in _CONFUSABLE_TABLE.items()},
+    **_LOOKALIKE_TABLE
+}
+
+# Largest edit distance any typosquatting rule scores; anything farther is
+# treated as unrelated, which lets the distance computation stop early
+_MAX_TYPO_DISTANCE = 3
+
+
+def _decode_idna(domain: str) -> str:
+    """Unicode form of a punycode domain, or the domain itself if it doesn't decode."""
+    if 'xn--' not in domain:
+        return domain
+    try:
+        return idna.decode(domain)
+    except UnicodeError:
+        return domain
+
+
+def _label_scripts(label: str) -> Set[str]:
+    """Scripts of the letters in a domain label (LATIN, CYRILLIC, ...)."""
+    return {unicodedata.name(char, '').partition(' ')[0] for char in label if char.isalpha()}
+
+
+def _visual_skeleton(domain: str) -> str:
+    """Fold a domain to its visual shape, so lookalikes share one skeleton."""
+    return _decode_idna(domain).translate(_SKELETON_TABLE).replace('rn', 'm').replace('vv', 'w')
+
 
 @dataclass
 class LinkAnalysisResult:
@@ -48,40 +160,26 @@ class EnhancedLinkAgent:
             "gmail.com", "outlook.com", "yahoo.com", "hotmail.com",
             "office.com", "live.com", "dropbox.com", "zoom.us"
         ]
+        self._allowlist_set = frozenset(self.allowlist_domains)
+        self._allowlist_skeletons = {_visual_skeleton(d): d for d in self.allowlist_domains}
+        self._brand_skeletons = frozenset(_visual_skeleton(d.split('.')[0]) for d in self.allowlist_domains)
+        
+        # domain -> (closest allowlist domain, edit distance); the same
+        # domains recur across links and emails
+        self._closest_cache: Dict[str, Tuple[str, int]] = {}
         
         # URL shorteners
-        self.url_shorteners = [
+        self.url_shorteners = frozenset([
             'bit.ly', 'tinyurl.com', 'goo.gl', 't.co', 'ow.ly',
             'short.link', 'tiny.cc', 'rebrand.ly', 'clicky.me',
             'is.gd', 'buff.ly', 'cutt.ly', 'soo.gd'
-        ]
+        ])
         
         # Suspicious TLDs
-        self.suspicious_tlds = [
+        self.suspicious_tlds = frozenset([
             '.tk', '.ml', '.ga', '.cf', '.gq', '.ru', '.cn',
             '.cc', '.pw', '.top', '.click', '.download'
-        ]
-        
-        # Common homoglyph characters
-        self.homoglyph_map = {
-            'a': ['а', 'α', 'à', 'á', 'â', 'ã', 'ä', 'å'],
-            'e': ['е', 'ë', 'è', 'é', 'ê', 'ε'],
-            'i': ['і', 'ï', 'ì', 'í', 'î', 'ι', '1', 'l'],
-            'o': ['о', 'ο', 'ò', 'ó', 'ô', 'õ', 'ö', '0'],
-            'u': ['υ', 'ù', 'ú', 'û', 'ü'],
-            'p': ['р', 'ρ'],
-            'c': ['с', 'ç'],
-            'x': ['х', 'χ'],
-            'y': ['у', 'ý', 'ÿ'],
-            'n': ['п'],
-            'm': ['м'],
-            'h': ['һ'],
-            'k': ['κ'],
-            't': ['τ'],
-            'b': ['в'],
-            'g': ['ց'],
-            'l': ['1', 'I', '|', 'ǀ'],
-        }
+        ])
 
     async def analyze_links(self, links: List[str]) -> Dict[str, Any]:
         """
@@ -106,26 +204,32 @@ class EnhancedLinkAgent:
         total_score = 0.0
         suspicious_count = 0
         
-        # Analyze each link
-        for url in links:
-            try:
-                link_analysis = await self._analyze_single_link(url)
-                analyzed_links.append(link_analysis)
-                total_score += link_analysis['score']
-                
-                if link_analysis['score'] >= 0.5:
-                    suspicious_count += 1
-                    
-            except Exception as e:
+        # Analyze all links concurrently so their WHOIS lookups overlap;
+        # results come back in input order
+        outcomes = await asyncio.gather(
+            *(self._analyze_single_link(url) for url in links),
+            return_exceptions=True
+        )
+        
+        for url, link_analysis in zip(links, outcomes):
+            if isinstance(link_analysis, Exception):
                 # Handle malformed URLs
                 analyzed_links.append({
                     'url': url,
                     'domain': 'invalid',
                     'score': 1.0,  # Malformed URLs are highly suspicious
-                    'reasons': [f'Malformed URL: {str(e)}']
+                    'reasons': [f'Malformed URL: {str(link_analysis)}']
                 })
                 total_score += 1.0
                 suspicious_count += 1
+            elif isinstance(link_analysis, BaseException):
+                raise link_analysis
+            else:
+                analyzed_links.append(link_analysis)
+                total_score += link_analysis['score']
+                
+                if link_analysis['score'] >= 0.5:
+                    suspicious_count += 1
         
         # Calculate overall score
         overall_score = total_score / len(links) if links else 0.0
@@ -181,8 +285,12 @@ class EnhancedLinkAgent:
         if allowlist_score > 0:
             score += allowlist_score
             if allowlist_score >= 0.5:
-                closest_domain = self._find_closest_allowlist_domain(domain)
-                reasons.append(f"Similar to trusted domain '{closest_domain}' (possible typosquatting)")
+                lookalike_domain = self._lookalike_allowlist_domain(domain)
+                if lookalike_domain:
+                    reasons.append(f"Visually mimics trusted domain '{lookalike_domain}' (character substitution)")
+                else:
+                    closest_domain = self._find_closest_allowlist_domain(domain)
+                    reasons.append(f"Similar to trusted domain '{closest_domain}' (possible typosquatting)")
         
         # 3. Check for URL shorteners
         if domain in self.url_shorteners:
@@ -249,17 +357,15 @@ class EnhancedLinkAgent:
     
     def _check_allowlist_similarity(self, domain: str) -> float:
         """Check similarity to allowlist domains using Levenshtein distance."""
-        if domain in self.allowlist_domains:
+        if domain in self._allowlist_set:
             return 0.0  # Exact match, trusted
         
-        min_distance = float('inf')
-        closest_domain = None
+        # Same look as a trusted domain (paypa1.com, faceb0ok.com) is a
+        # stronger signal than a generic typo; no edit distance needed
+        if self._lookalike_allowlist_domain(domain):
+            return 0.7
         
-        for allowed_domain in self.allowlist_domains:
-            dist = levenshtein_distance(domain, allowed_domain)
-            if dist < min_distance:
-                min_distance = dist
-                closest_domain = allowed_domain
+        closest_domain, min_distance = self._closest_allowlist_match(domain)
         
         # Calculate similarity score
         if closest_domain:
@@ -276,18 +382,39 @@ class EnhancedLinkAgent:
         
         return 0.0
     
+    def _lookalike_allowlist_domain(self, domain: str) -> Optional[str]:
+        """Allowlist domain that looks the same as the given one, if any."""
+        return self._allowlist_skeletons.get(_visual_skeleton(domain))
+    
     def _find_closest_allowlist_domain(self, domain: str) -> str:
-        """Find the closest allowlist domain to the given domain."""
-        min_distance = float('inf')
+        """Find the closest allowlist domain to the given domain (empty if none is within typo range)."""
+        return self._closest_allowlist_match(domain)[0]
+    
+    def _closest_allowlist_match(self, domain: str) -> Tuple[str, int]:
+        """
+        Closest allowlist domain within typo range and its edit distance,
+        cached per domain. Returns ("", _MAX_TYPO_DISTANCE + 1) when no
+        allowlist domain is that close.
+        """
+        cached = self._closest_cache.get(domain)
+        if cached is not None:
+            return cached
+        
+        min_distance = _MAX_TYPO_DISTANCE + 1
         closest_domain = ""
         
         for allowed_domain in self.allowlist_domains:
-            dist = levenshtein_distance(domain, allowed_domain)
+            # Only a strictly smaller distance matters, so the cutoff lets the
+            # C implementation bail out once it can't beat the current best
+            dist = levenshtein_distance(domain, allowed_domain, score_cutoff=min_distance - 1)
             if dist < min_distance:
                 min_distance = dist
                 closest_domain = allowed_domain
         
-        return closest_domain
+        if len(self._closest_cache) >= _SIMILARITY_CACHE_SIZE:
+            self._closest_cache.clear()
+        self._closest_cache[domain] = (closest_domain, min_distance)
+        return closest_domain, min_distance
     
     def _check_punycode(self, domain: str) -> Tuple[float, List[str]]:
         """Check for punycode domains (internationalized domain names)."""
@@ -327,32 +454,32 @@ class EnhancedLinkAgent:
         return score, reasons
     
     def _check_homoglyphs(self, domain: str) -> Tuple[float, List[str]]:
-        """Check for homoglyph characters in domain."""
+        """
+        Check for non-ASCII characters that pass for Latin ones, in labels that
+        mix scripts or look like a trusted brand. Single-script IDN labels such
+        as münchen or пример are legitimate and not scored.
+        """
         reasons = []
         score = 0.0
         
-        try:
-            # Check for confusable characters
-            suspicious_chars = []
-            
-            for char in domain:
-                if confusables.is_confusable(char, prefer_ascii=True):
-                    suspicious_chars.append(char)
-            
-            if suspicious_chars:
-                score += len(suspicious_chars) * 0.1
-                reasons.append(f"Contains potentially confusing characters: {''.join(set(suspicious_chars))}")
+        suspicious_chars = []
+        for label in _decode_idna(domain).split('.'):
+            confusable_chars = [char for char in label if ord(char) in _CONFUSABLE_TABLE]
+            if confusable_chars and (len(_label_scripts(label)) > 1 or
+                                     _visual_skeleton(label) in self._brand_skeletons):
+                suspicious_chars.extend(confusable_chars)
+        
+        if suspicious_chars:
+            score += len(suspicious_chars) * 0.1
+            reasons.append(f"Contains potentially confusing characters: {''.join(dict.fromkeys(suspicious_chars))}")
             
-            # Additional check using our homoglyph map
-            for ascii_char, similar_chars in self.homoglyph_map.items():
-                for char in domain:
-                    if char in similar_chars:
-                        score += 0.1
-                        reasons.append(f"Character '{char}' resembles '{ascii_char}'")
-                        break
-                        
-        except Exception:
-            pass
+            # One reason per imitated letter, naming the first character imitating it
+            imitated = {}
+            for char in suspicious_chars:
+                imitated.setdefault(_CONFUSABLE_TABLE[ord(char)], char)
+            for ascii_char, char in imitated.items():
+                score += 0.1
+                reasons.append(f"Character '{char}' resembles '{ascii_char}'")
         
         return min(0.5, score), reasons
     
@@ -362,15 +489,7 @@ class EnhancedLinkAgent:
         score = 0.0
         
         try:
-            # Try to get WHOIS information
-            w = whois.whois(domain)
-            creation_date = None
-            
-            if w.creation_date:
-                if isinstance(w.creation_date, list):
-                    creation_date = w.creation_date[0]
-                else:
-                    creation_date = w.creation_date
+            creation_date = await self._get_creation_date(domain)
             
             if creation_date:
                 # Check if domain is very new (created within last 30 days)
@@ -397,6 +516,30 @@ class EnhancedLinkAgent:
         
         return score, reasons
     
+    async def _get_creation_date(self, domain: str) -> Optional[datetime]:
+        """WHOIS creation date for a domain, served from the shared cache when fresh."""
+        now = time.monotonic()
+        cached = _WHOIS_CACHE.get(domain)
+        if cached is not None and now - cached[0] < _WHOIS_CACHE_TTL:
+            return cached[1]
+        
+        # The whois client blocks on a socket; keep it off the event loop so
+        # the other agents keep running during the lookup. Failures propagate
+        # uncached so a transient outage is retried next time.
+        w = await asyncio.to_thread(whois.whois, domain)
+        creation_date = None
+        
+        if w.creation_date:
+            if isinstance(w.creation_date, list):
+                creation_date = w.creation_date[0]
+            else:
+                creation_date = w.creation_date
+        
+        if len(_WHOIS_CACHE) >= _WHOIS_CACHE_SIZE:
+            _WHOIS_CACHE.clear()
+        _WHOIS_CACHE[domain] = (now, creation_date)
+        return creation_date
+    
     def _check_url_patterns(self, url: str) -> Tuple[float, List[str]]:
         """Check for suspicious URL patterns."""
         reasons = []
@@ -503,21 +646,14 @@ class EnhancedLinkAgent:
         
         # Extract from text using regex
         combined_text = f"{body_html} {body_text}"
-        url_patterns = [
-            r'https?://[^\s<>"\'`]+',  # Standard HTTP/HTTPS URLs
-            r'www\.[^\s<>"\'`]+',      # www. URLs without protocol
-            r'ftp://[^\s<>"\'`]+',     # FTP URLs
-        ]
-        
-        for pattern in url_patterns:
-            matches = re.findall(pattern, combined_text, re.IGNORECASE)
-            urls.update(matches)
+        for pattern in _URL_PATTERNS:
+            urls.update(pattern.findall(combined_text))
         
         # Clean and validate URLs
         cleaned_urls = []
         for url in urls:
             # Remove trailing punctuation
-            url = re.sub(r'[.,;!?)\]}>"\']$', '', url)
+            url = _TRAILING_PUNCT_RE.sub('', url)
             
             # Add protocol if missing
             if url.startswith('www.') and not url.startswith(('http://', 'https://')):
@@ -554,6 +690,24 @@ async def analyze_links(links: List[str]) -> Dict[str, Any]:
     return await agent.analyze_links(links)
 
 
+@dataclass(slots=True, frozen=True)
+class LinkAnalysisResultLegacy:
+    """Legacy link analysis result returned by LinkAgent."""
+    total_links: int
+    suspicious_links: List[str]
+    shortened_links: List[str]
+    suspicious_domains: List[str]
+    ip_addresses: List[str]
+    redirect_chains: List[str]
+    score: float
+    confidence: float
+    details: str
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Shallow dict of the result fields (cheaper than dataclasses.asdict)."""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
 # Backward compatibility class for orchestrator
 class LinkAgent:
     """Backward compatibility wrapper for the enhanced link agent."""
@@ -578,27 +732,12 @@ class LinkAgent:
         # Extract additional URLs from content
         extracted_urls = agent.extract_urls_from_content(body_html, body_text)
         
-        # Combine all URLs
-        all_urls = list(set(provided_links + extracted_urls))
+        # Combine all URLs, de-duplicated in first-seen order
+        all_urls = list(dict.fromkeys(provided_links + extracted_urls))
         
         # Analyze URLs
         result = await agent.analyze_links(all_urls)
         
-        # Convert to legacy format
-        from dataclasses import dataclass
-        
-        @dataclass
-        class LinkAnalysisResultLegacy:
-            total_links: int
-            suspicious_links: List[str]
-            shortened_links: List[str] 
-            suspicious_domains: List[str]
-            ip_addresses: List[str]
-            redirect_chains: List[str]
-            score: float
-            confidence: float
-            details: str
-        
         # Extract legacy data from new format
         suspicious_links = [link['url'] for link in result['links'] if link['score'] >= 0.5]
         ip_addresses = [link['url'] for link in result['links'] 
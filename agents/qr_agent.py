@@ -3,11 +3,15 @@ QR Code Agent for analyzing QR codes in emails for phishing indicators.
 """
 
 import re
-import base64
+import binascii
 import io
+import os
 import asyncio
+import atexit
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Any, Tuple, Optional, Union
 from dataclasses import dataclass
+from functools import lru_cache
 import urllib.parse
 from datetime import datetime
 import warnings
@@ -29,9 +33,93 @@ from bs4 import BeautifulSoup
 # URL analysis (reuse from link agent)
 import tldextract
 
+# Optional JIT compilation for the image fallback pipeline
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
 # Suppress warnings for cleaner output
 warnings.filterwarnings('ignore')
 
+# Maximum number of reasons reported per QR code
+MAX_QR_REASONS = 5
+
+# Cheap probe used to skip HTML parsing for bodies without images
+_IMG_TAG_RE = re.compile(r'<img', re.IGNORECASE)
+
+# libzbar releases the GIL, so image decodes run in parallel on this pool
+_QR_POOL = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 2), thread_name_prefix='qr-decode')
+atexit.register(_QR_POOL.shutdown, wait=False)
+
+
+if njit is not None:
+    @njit(cache=True, parallel=True)
+    def _binarize(gray, out):
+        """Threshold a uint8 grayscale image into ``out`` (same as cv2.THRESH_BINARY at 127)."""
+        for i in prange(gray.shape[0]):
+            for j in range(gray.shape[1]):
+                out[i, j] = 255 if gray[i, j] > 127 else 0
+
+    @njit(cache=True, parallel=True)
+    def _close_2x2(src, out):
+        """Morphological close with a 2x2 kernel (same as cv2.MORPH_CLOSE)."""
+        rows, cols = src.shape
+        dilated = np.empty_like(src)
+        
+        # Dilate: max over the pixel and its upper/left neighbours
+        for i in prange(rows):
+            for j in range(cols):
+                value = src[i, j]
+                if i > 0 and src[i - 1, j] > value:
+                    value = src[i - 1, j]
+                if j > 0 and src[i, j - 1] > value:
+                    value = src[i, j - 1]
+                if i > 0 and j > 0 and src[i - 1, j - 1] > value:
+                    value = src[i - 1, j - 1]
+                dilated[i, j] = value
+        
+        # Erode: min over the same neighbourhood of the dilated image
+        for i in prange(rows):
+            for j in range(cols):
+                value = dilated[i, j]
+                if i > 0 and dilated[i - 1, j] < value:
+                    value = dilated[i - 1, j]
+                if j > 0 and dilated[i, j - 1] < value:
+                    value = dilated[i, j - 1]
+                if i > 0 and j > 0 and dilated[i - 1, j - 1] < value:
+                    value = dilated[i - 1, j - 1]
+                out[i, j] = value
+else:
+    _binarize = None
+    _close_2x2 = None
+
+
+def _decode_base64(data: Union[str, bytes]) -> bytes:
+    """Decode base64 image data, tolerating line breaks and missing padding."""
+    # Drop MIME line breaks first so they don't count towards the padding
+    data = ('' if isinstance(data, str) else b'').join(data.split())
+    pad = (-len(data)) % 4
+    if pad:
+        data = data + ('=' if isinstance(data, str) else b'=') * pad
+    return binascii.a2b_base64(data)
+
+
+@lru_cache(maxsize=4096)
+def _split_domain(netloc: str) -> Tuple[str, str]:
+    """Return the registered domain and public suffix for a URL netloc (memoized per host)."""
+    extracted = tldextract.extract(netloc)
+    return f"{extracted.domain}.{extracted.suffix}".lower(), extracted.suffix
+
+
+def _add_reason(reasons: List[str], reason: str, *args: Any) -> None:
+    """Append ``reason % args`` unless the list already holds MAX_QR_REASONS.
+
+    The message is only formatted when it is actually appended.
+    """
+    if len(reasons) < MAX_QR_REASONS:
+        reasons.append(reason % args if args else reason)
+
 
 @dataclass
 class QRCodeData:
@@ -67,24 +155,24 @@ class QRCodeAgent:
         ]
         
         # Suspicious URL patterns (reuse link agent logic)
-        self.suspicious_tlds = [
+        self.suspicious_tlds = frozenset([
             '.tk', '.ml', '.ga', '.cf', '.gq', '.ru', '.cn',
             '.cc', '.pw', '.top', '.click', '.download'
-        ]
+        ])
         
         # URL shorteners
-        self.url_shorteners = [
+        self.url_shorteners = frozenset([
             'bit.ly', 'tinyurl.com', 'goo.gl', 't.co', 'ow.ly',
             'short.link', 'tiny.cc', 'rebrand.ly', 'clicky.me',
             'is.gd', 'buff.ly', 'cutt.ly', 'soo.gd'
-        ]
+        ])
         
         # Trusted domains
-        self.trusted_domains = [
+        self.trusted_domains = frozenset([
             'microsoft.com', 'google.com', 'paypal.com', 'amazon.com',
             'apple.com', 'facebook.com', 'twitter.com', 'linkedin.com',
             'github.com', 'stackoverflow.com', 'wikipedia.org', 'youtube.com'
-        ]
+        ])
 
     async def analyze(self, email_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -165,9 +253,12 @@ class QRCodeAgent:
         
         # Extract from attachments (if provided)
         attachments = email_data.get('attachments', [])
-        for attachment in attachments:
-            attachment_qr_codes = await self._extract_from_attachment(attachment)
-            qr_codes.extend(attachment_qr_codes)
+        if attachments:
+            attachment_results = await asyncio.gather(
+                *(self._extract_from_attachment(attachment) for attachment in attachments)
+            )
+            for attachment_qr_codes in attachment_results:
+                qr_codes.extend(attachment_qr_codes)
         
         return qr_codes
 
@@ -175,6 +266,10 @@ class QRCodeAgent:
         """Extract QR codes from HTML image tags."""
         qr_codes = []
         
+        # Most emails carry no images; skip the full parse for them
+        if not _IMG_TAG_RE.search(html_content):
+            return qr_codes
+        
         try:
             soup = BeautifulSoup(html_content, 'html.parser')
             
@@ -189,7 +284,7 @@ class QRCodeAgent:
                     try:
                         # Extract base64 data
                         header, data = src.split(',', 1)
-                        image_data = base64.b64decode(data)
+                        image_data = _decode_base64(data)
                         
                         # Decode QR codes from image
                         qr_data_list = await self._decode_qr_from_bytes(image_data, 'embedded_image')
@@ -227,8 +322,11 @@ class QRCodeAgent:
             
             # Only process image attachments
             if content_type.startswith('image/') or any(ext in filename.lower() for ext in ['.png', '.jpg', '.jpeg', '.gif', '.bmp']):
-                # Decode base64 attachment
-                image_data = base64.b64decode(content)
+                # Upstream MIME parsers may hand over an already-decoded image
+                if isinstance(content, Image.Image):
+                    image_data = content
+                else:
+                    image_data = _decode_base64(content)
                 
                 # Decode QR codes from image
                 qr_data_list = await self._decode_qr_from_bytes(image_data, f'attachment:{filename}')
@@ -240,13 +338,21 @@ class QRCodeAgent:
         
         return qr_codes
 
-    async def _decode_qr_from_bytes(self, image_data: bytes, location: str) -> List[QRCodeData]:
-        """Decode QR codes from image bytes."""
+    async def _decode_qr_from_bytes(self, image_data: Union[bytes, 'Image.Image'], location: str) -> List[QRCodeData]:
+        """Decode QR codes from image bytes or an already-opened PIL image."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_QR_POOL, self._decode_qr_sync, image_data, location)
+
+    def _decode_qr_sync(self, image_data: Union[bytes, 'Image.Image'], location: str) -> List[QRCodeData]:
+        """Blocking QR decode, run on the decode pool."""
         qr_codes = []
         
         try:
-            # Convert bytes to PIL Image
-            image = Image.open(io.BytesIO(image_data))
+            if isinstance(image_data, Image.Image):
+                image = image_data
+            else:
+                image = Image.open(io.BytesIO(image_data))
+                image.load()
             
             # Convert to RGB if needed (pyzbar works better with RGB/grayscale)
             if image.mode not in ('RGB', 'L'):
@@ -258,30 +364,29 @@ class QRCodeAgent:
             # If that fails, try with OpenCV processing
             if not decoded_objects:
                 try:
-                    # Convert to numpy array for OpenCV
-                    img_array = np.array(image)
+                    # Convert to grayscale once; every later stage works in place
+                    # on a single scratch buffer instead of allocating new arrays
+                    img_gray = np.asarray(image.convert('L'))
+                    img_work = np.empty_like(img_gray)
                     
-                    # Convert to grayscale if needed
-                    if len(img_array.shape) == 3:
-                        if img_array.shape[2] == 4:  # RGBA
-                            img_gray = cv2.cvtColor(img_array, cv2.COLOR_RGBA2GRAY)
-                        else:  # RGB
-                            img_gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
+                    # Retry ladder: threshold, then morph-close the thresholded
+                    # image, stopping at the first stage that decodes.
+                    # Numba kernels are used when available, OpenCV otherwise.
+                    if _binarize is not None:
+                        _binarize(img_gray, img_work)
                     else:
-                        img_gray = img_array
-                    
-                    # Apply some image processing to improve detection
-                    # Threshold the image
-                    _, img_thresh = cv2.threshold(img_gray, 127, 255, cv2.THRESH_BINARY)
+                        cv2.threshold(img_gray, 127, 255, cv2.THRESH_BINARY, dst=img_work)
+                    decoded_objects = pyzbar.decode(img_work)
                     
-                    # Try decoding the thresholded image
-                    decoded_objects = pyzbar.decode(img_thresh)
-                    
-                    # If still no luck, try with morphological operations
                     if not decoded_objects:
-                        kernel = np.ones((2,2), np.uint8)
-                        img_morph = cv2.morphologyEx(img_thresh, cv2.MORPH_CLOSE, kernel)
-                        decoded_objects = pyzbar.decode(img_morph)
+                        if _close_2x2 is not None:
+                            img_closed = np.empty_like(img_work)
+                            _close_2x2(img_work, img_closed)
+                            img_work = img_closed
+                        else:
+                            kernel = np.ones((2, 2), np.uint8)
+                            cv2.morphologyEx(img_work, cv2.MORPH_CLOSE, kernel, dst=img_work)
+                        decoded_objects = pyzbar.decode(img_work)
                         
                 except Exception as cv_error:
                     # OpenCV processing failed, but we might have gotten results from PIL
@@ -344,57 +449,51 @@ class QRCodeAgent:
 
     async def _analyze_single_qr_code(self, qr_data: QRCodeData) -> Dict[str, Any]:
         """Analyze a single QR code for suspicious patterns."""
+        # Sub-analyzers stop adding to this list at MAX_QR_REASONS and skip
+        # formatting the messages they drop; scores are always accumulated
         reasons = []
         score = 0.0
         
         content = qr_data.content
         content_type = qr_data.content_type
         
+        # Lowercase once and share it with every sub-analyzer
+        content_lower = content.lower()
+        
         # Base score for having a QR code (slightly suspicious by default)
         score += 0.1
         reasons.append("Contains QR code (requires user interaction)")
         
         # Analyze based on content type
         if content_type == 'url':
-            url_score, url_reasons = await self._analyze_qr_url(content)
-            score += url_score
-            reasons.extend(url_reasons)
+            score += await self._analyze_qr_url(content, reasons)
         
         elif content_type == 'text':
-            text_score, text_reasons = self._analyze_qr_text(content)
-            score += text_score
-            reasons.extend(text_reasons)
+            score += self._analyze_qr_text(content, content_lower, reasons)
         
         elif content_type == 'vcard':
-            vcard_score, vcard_reasons = self._analyze_qr_vcard(content)
-            score += vcard_score
-            reasons.extend(vcard_reasons)
+            score += self._analyze_qr_vcard(content, content_lower, reasons)
         
         elif content_type == 'wifi':
-            wifi_score, wifi_reasons = self._analyze_qr_wifi(content)
-            score += wifi_score
-            reasons.extend(wifi_reasons)
+            score += self._analyze_qr_wifi(content_lower, reasons)
         
         elif content_type == 'external_image':
             score += 0.3
             reasons.append("QR code loaded from external source")
         
         # Check for suspicious keywords across all content types
-        keyword_score, keyword_reasons = self._check_suspicious_keywords(content)
-        score += keyword_score
-        reasons.extend(keyword_reasons)
+        score += self._check_suspicious_keywords(content_lower, reasons)
         
         return {
             'content': content[:100] + ('...' if len(content) > 100 else ''),  # Truncate for display
             'content_type': content_type,
             'location': qr_data.location,
             'score': min(1.0, score),
-            'reasons': reasons[:5]  # Limit to top 5 reasons
+            'reasons': reasons  # Already capped at MAX_QR_REASONS
         }
 
-    async def _analyze_qr_url(self, url: str) -> Tuple[float, List[str]]:
-        """Analyze URL content in QR code."""
-        reasons = []
+    async def _analyze_qr_url(self, url: str, reasons: List[str]) -> float:
+        """Analyze URL content in QR code, appending reasons to ``reasons``."""
         score = 0.0
         
         try:
@@ -402,24 +501,23 @@ class QRCodeAgent:
             parsed = urllib.parse.urlparse(url)
             
             # Extract domain
-            extracted = tldextract.extract(url)
-            domain = f"{extracted.domain}.{extracted.suffix}".lower()
+            domain, suffix = _split_domain(parsed.netloc)
             
             # Check if it's an IP address
             if self._is_ip_address(parsed.netloc):
                 score += 0.7
-                reasons.append("QR URL uses IP address")
+                _add_reason(reasons, "QR URL uses IP address")
             
             # Check for suspicious TLDs
-            tld = f".{extracted.suffix}"
+            tld = f".{suffix}"
             if tld in self.suspicious_tlds:
                 score += 0.4
-                reasons.append(f"QR URL uses suspicious TLD: {tld}")
+                _add_reason(reasons, "QR URL uses suspicious TLD: %s", tld)
             
             # Check for URL shorteners
             if domain in self.url_shorteners:
                 score += 0.5
-                reasons.append("QR URL uses shortening service")
+                _add_reason(reasons, "QR URL uses shortening service")
             
             # Check if domain is trusted
             if domain in self.trusted_domains:
@@ -428,24 +526,24 @@ class QRCodeAgent:
             # Check for HTTPS
             if parsed.scheme == 'http':
                 score += 0.2
-                reasons.append("QR URL uses insecure HTTP")
+                _add_reason(reasons, "QR URL uses insecure HTTP")
             
             # Check for suspicious paths
             suspicious_paths = ['/login', '/verify', '/confirm', '/update', '/secure', '/download']
+            path_lower = parsed.path.lower()
             for path in suspicious_paths:
-                if path in parsed.path.lower():
+                if path in path_lower:
                     score += 0.2
-                    reasons.append(f"QR URL contains suspicious path: {path}")
+                    _add_reason(reasons, "QR URL contains suspicious path: %s", path)
             
         except Exception as e:
             score += 0.5
-            reasons.append("QR URL is malformed")
+            _add_reason(reasons, "QR URL is malformed")
         
-        return score, reasons
+        return score
 
-    def _analyze_qr_text(self, text: str) -> Tuple[float, List[str]]:
-        """Analyze plain text content in QR code."""
-        reasons = []
+    def _analyze_qr_text(self, text: str, text_lower: str, reasons: List[str]) -> float:
+        """Analyze plain text content in QR code, appending reasons to ``reasons``."""
         score = 0.0
         
         # Check for cryptocurrency addresses
@@ -458,7 +556,7 @@ class QRCodeAgent:
         for pattern in crypto_patterns:
             if re.search(pattern, text):
                 score += 0.6
-                reasons.append("QR contains cryptocurrency address")
+                _add_reason(reasons, "QR contains cryptocurrency address")
                 break
         
         # Check for bank account patterns
@@ -469,66 +567,58 @@ class QRCodeAgent:
         ]
         
         for pattern in bank_patterns:
-            if re.search(pattern, text.lower()):
+            if re.search(pattern, text_lower):
                 score += 0.7
-                reasons.append("QR contains financial information")
+                _add_reason(reasons, "QR contains financial information")
                 break
         
-        return score, reasons
+        return score
 
-    def _analyze_qr_vcard(self, vcard: str) -> Tuple[float, List[str]]:
-        """Analyze vCard content in QR code."""
-        reasons = []
+    def _analyze_qr_vcard(self, vcard: str, vcard_lower: str, reasons: List[str]) -> float:
+        """Analyze vCard content in QR code, appending reasons to ``reasons``."""
         score = 0.0
         
-        # vCards are generally legitimate, but check for suspicious content
-        vcard_lower = vcard.lower()
-        
-        # Check for suspicious organization names
+        # vCards are generally legitimate, but check for suspicious organization names
         suspicious_orgs = ['bank', 'police', 'irs', 'government', 'security', 'microsoft', 'apple', 'google']
         for org in suspicious_orgs:
             if org in vcard_lower:
                 score += 0.3
-                reasons.append(f"vCard claims affiliation with {org}")
+                _add_reason(reasons, "vCard claims affiliation with %s", org)
         
         # Check for multiple phone numbers (could be scammer pattern)
         phone_count = vcard.count('TEL:')
         if phone_count > 3:
             score += 0.2
-            reasons.append("vCard contains many phone numbers")
+            _add_reason(reasons, "vCard contains many phone numbers")
         
-        return score, reasons
+        return score
 
-    def _analyze_qr_wifi(self, wifi: str) -> Tuple[float, List[str]]:
-        """Analyze WiFi configuration in QR code."""
-        reasons = []
+    def _analyze_qr_wifi(self, wifi_lower: str, reasons: List[str]) -> float:
+        """Analyze WiFi configuration in QR code, appending reasons to ``reasons``."""
         score = 0.0
         
         # WiFi QR codes can be used for evil twin attacks
         score += 0.3
-        reasons.append("WiFi QR code (potential security risk)")
+        _add_reason(reasons, "WiFi QR code (potential security risk)")
         
         # Check for open networks
-        if 'nopass' in wifi.lower() or 'open' in wifi.lower():
+        if 'nopass' in wifi_lower or 'open' in wifi_lower:
             score += 0.2
-            reasons.append("WiFi QR code for open network")
+            _add_reason(reasons, "WiFi QR code for open network")
         
         # Check for suspicious network names
-        wifi_lower = wifi.lower()
         suspicious_names = ['free', 'public', 'guest', 'open', 'wifi', 'internet']
         for name in suspicious_names:
             if name in wifi_lower:
                 score += 0.1
-                reasons.append(f"WiFi network name contains '{name}'")
+                _add_reason(reasons, "WiFi network name contains '%s'", name)
         
-        return score, reasons
+        return score
 
-    def _check_suspicious_keywords(self, content: str) -> Tuple[float, List[str]]:
-        """Check for suspicious keywords in QR content."""
-        reasons = []
+    def _check_suspicious_keywords(self, content_lower: str, reasons: List[str]) -> float:
+        """Check for suspicious keywords in lowercased QR content, appending reasons to ``reasons``."""
         score = 0.0
         
-        content_lower = content.lower()
         found_keywords = []
         
         for keyword in self.suspicious_keywords:
@@ -537,9 +627,10 @@ class QRCodeAgent:
         
         if found_keywords:
             score += len(found_keywords) * 0.1
-            reasons.append(f"Contains suspicious keywords: {', '.join(found_keywords[:3])}")
+            if len(reasons) < MAX_QR_REASONS:
+                reasons.append(f"Contains suspicious keywords: {', '.join(found_keywords[:3])}")
         
-        return min(0.5, score), reasons
+        return min(0.5, score)
 
     def _is_ip_address(self, netloc: str) -> bool:
         """Check if netloc is an IP address."""
@@ -605,14 +696,5 @@ async def analyze_qr_codes(email_data: Dict[str, Any]) -> Dict[str, Any]:
         Dict with keys: 'score', 'qr_codes', 'total_qr_codes', 'suspicious_count', 'details', 'confidence'
     """
     agent = await get_qr_agent()
-    result = await agent.analyze(email_data)
-    
-    # Convert dataclass to dict for compatibility
-    return {
-        'score': result.score,
-        'qr_codes': result.qr_codes,
-        'total_qr_codes': result.total_qr_codes,
-        'suspicious_count': result.suspicious_count,
-        'details': result.details,
-        'confidence': result.confidence
-    }
+    return await agent.analyze(email_data)
+
@@ -5,10 +5,9 @@ Example usage of the enhanced orchestrator functions.
 This demonstrates how to use the new orchestrate() function with configurable weights.
 """
 
-import asyncio
 from orchestrator import orchestrate, OrchestrationConfig
 
-async def example_orchestration():
+def example_orchestration():
     """Example of using the new orchestration functions."""
     
     print("🎯 Enhanced Orchestrator Example")
@@ -55,14 +54,31 @@ async def example_orchestration():
         "details": "High behavioral suspicion detected. First message from this sender"
     }
     
+    header_output = {
+        "score": 0.5,
+        "verdict": "normal",
+        "reasons": ["Reply-To domain differs from From domain"],
+        "details": "Minor header inconsistencies detected"
+    }
+    
+    qr_output = {
+        "score": 0.0,
+        "qr_codes": [],
+        "total_qr_codes": 0,
+        "suspicious_count": 0,
+        "details": "No QR codes found in email"
+    }
+    
     print("📊 Agent Outputs:")
     print(f"  Content Score: {content_output['score']:.2f}")
     print(f"  Link Score: {link_output['score']:.2f}")
     print(f"  Behavior Score: {behavior_output['score']:.2f}")
+    print(f"  Header Score: {header_output['score']:.2f}")
+    print(f"  QR Score: {qr_output['score']:.2f}")
     
-    # Example 1: Default weights (content=0.5, link=0.3, behavior=0.2)
+    # Example 1: Default weights (content=0.30, link=0.20, behavior=0.20, header=0.20, qr=0.10)
     print(f"\n🎯 Orchestration with Default Weights:")
-    result1 = await orchestrate(content_output, link_output, behavior_output)
+    result1 = orchestrate(content_output, link_output, behavior_output, header_output, qr_output)
     
     print(f"  Final Score: {result1.final_score:.3f}")
     print(f"  Action: {result1.action.upper()}")
@@ -72,12 +88,14 @@ async def example_orchestration():
     # Example 2: Custom weights (emphasize behavior more)
     print(f"\n🎯 Orchestration with Custom Weights (Behavior-Heavy):")
     custom_config = OrchestrationConfig(
-        content_weight=0.3,
-        link_weight=0.2, 
-        behavior_weight=0.5
+        content_weight=0.2,
+        link_weight=0.15,
+        behavior_weight=0.4,
+        header_weight=0.15,
+        qr_weight=0.1
     )
     
-    result2 = await orchestrate(content_output, link_output, behavior_output, custom_config)
+    result2 = orchestrate(content_output, link_output, behavior_output, header_output, qr_output, custom_config)
     
     print(f"  Final Score: {result2.final_score:.3f}")
     print(f"  Action: {result2.action.upper()}")
@@ -86,9 +104,9 @@ async def example_orchestration():
     
     # Example 3: Show detailed reasons
     print(f"\n🔍 Detailed Analysis (Top 3 Reasons):")
-    for i, reason in enumerate(result1.detailed_reasons[:3], 1):
-        print(f"  {i}. {reason['text']}")
-        print(f"     Agent: {reason['agent']}, Priority: {reason['priority']:.3f}")
+    for i, reason in enumerate(result1.top_reasons(3), 1):
+        print(f"  {i}. {reason.text}")
+        print(f"     Agent: {reason.agent}, Priority: {reason.priority:.3f}")
     
     # Example 4: Different action thresholds demo
     print(f"\n📋 Action Mapping:")
@@ -97,7 +115,7 @@ async def example_orchestration():
     print(f"  quarantine: score ≥ 0.7")
     print(f"  + Override rules for high-risk indicators")
 
-async def demonstrate_weight_impact():
+def demonstrate_weight_impact():
     """Demonstrate how different weights affect the final decision."""
     
     print(f"\n🧪 Weight Impact Demonstration")
@@ -125,20 +143,24 @@ async def demonstrate_weight_impact():
         "details": "Established sender, no anomalies"
     }
     
+    header_out = {"score": 0.1, "verdict": "normal", "reasons": [], "details": "Headers look normal"}
+    qr_out = {"score": 0.0, "qr_codes": [], "total_qr_codes": 0, "suspicious_count": 0, "details": "No QR codes"}
+    
     weight_scenarios = [
-        ("Content-Heavy", OrchestrationConfig(0.8, 0.1, 0.1)),
-        ("Balanced", OrchestrationConfig(0.33, 0.33, 0.34)),
-        ("Content-Light", OrchestrationConfig(0.2, 0.4, 0.4))
+        ("Content-Heavy", OrchestrationConfig(0.8, 0.05, 0.05, 0.05, 0.05)),
+        ("Balanced", OrchestrationConfig(0.2, 0.2, 0.2, 0.2, 0.2)),
+        ("Content-Light", OrchestrationConfig(0.1, 0.3, 0.3, 0.2, 0.1))
     ]
     
-    print("Scenario: High content risk (0.9), low link/behavior risk (0.1)")
+    print("Scenario: High content risk (0.9), low link/behavior/header risk (0.1), no QR codes")
     print()
     
     for name, config in weight_scenarios:
-        result = await orchestrate(content_out, link_out, behavior_out, config)
-        weights = f"C:{config.content_weight}/L:{config.link_weight}/B:{config.behavior_weight}"
+        result = orchestrate(content_out, link_out, behavior_out, header_out, qr_out, config)
+        weights = (f"C:{config.content_weight}/L:{config.link_weight}/B:{config.behavior_weight}/"
+                   f"H:{config.header_weight}/Q:{config.qr_weight}")
         print(f"  {name:15} ({weights}): Score={result.final_score:.2f} → {result.action.upper()}")
 
 if __name__ == "__main__":
-    asyncio.run(example_orchestration())
-    asyncio.run(demonstrate_weight_impact())
+    example_orchestration()
+    demonstrate_weight_impact()
@@ -4,12 +4,14 @@ FastAPI application for email phishing analysis service.
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, Field
 from typing import Dict, List, Any, Optional
 import uvicorn
 import logging
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime
-from dataclasses import asdict
 
 from orchestrator import EmailAnalysisOrchestrator
 
@@ -17,13 +19,22 @@ from orchestrator import EmailAnalysisOrchestrator
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Compile the scoring kernels before the first request arrives."""
+    import orchestrator_kernels  # noqa: F401
+    yield
+
+
 # Create FastAPI app
 app = FastAPI(
     title="Email Phishing Analysis Service",
     description="Multi-agent email analysis service for detecting phishing attempts",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -38,6 +49,18 @@ app.add_middleware(
 # Initialize orchestrator
 orchestrator = EmailAnalysisOrchestrator()
 
+# Last formatted UTC timestamp, refreshed at most once per second
+_ts_cache = [0, '']
+
+
+def _now_iso() -> str:
+    """Current UTC time as an ISO string at one-second resolution."""
+    t = int(time.time())
+    if t != _ts_cache[0]:
+        _ts_cache[0] = t
+        _ts_cache[1] = datetime.utcfromtimestamp(t).isoformat()
+    return _ts_cache[1]
+
 
 class EmailAnalysisRequest(BaseModel):
     """Request model for email analysis."""
@@ -171,7 +194,7 @@ async def health_check():
     """Health check endpoint."""
     return {
         "status": "healthy",
-        "timestamp": datetime.utcnow().isoformat(),
+        "timestamp": _now_iso(),
         "agents": {
             "content_agent": "operational",
             "link_agent": "operational",
@@ -218,10 +241,6 @@ async def analyze_email(request: EmailAnalysisRequest):
         # Convert QR codes to QRCodeData objects
         qr_codes = [QRCodeData(**qr_code) for qr_code in analysis_result.qr_analysis.get('qr_codes', [])]
 
-        # Convert routing_analysis to dict
-        if 'routing_analysis' in analysis_result.header_analysis and analysis_result.header_analysis['routing_analysis'] is not None:
-            analysis_result.header_analysis['routing_analysis'] = asdict(analysis_result.header_analysis['routing_analysis'])
-        
         response = EmailAnalysisResponse(
             content_analysis=ContentAnalysisResult(
                 score=analysis_result.content_analysis.get('score', 0.0),
@@ -243,7 +262,7 @@ async def analyze_email(request: EmailAnalysisRequest):
             action=analysis_result.action,
             confidence=analysis_result.confidence,
             summary=analysis_result.summary,
-            timestamp=datetime.utcnow().isoformat()
+            timestamp=_now_iso()
         )
         
         logger.info(f"Analysis complete. Score: {response.final_score:.2f}, Action: {response.action}")
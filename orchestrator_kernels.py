@@ -0,0 +1,163 @@
+"""
+Numeric kernels for orchestration scoring and action selection.
+
+Compiled with Numba when it is installed; otherwise the same loop runs as
+plain Python, so results are identical either way.
+"""
+
+import numpy as np
+
+try:
+    from numba import njit
+    _NUMBA_AVAILABLE = True
+except ImportError:
+    njit = None
+    _NUMBA_AVAILABLE = False
+
+
+def _score_batch(scores, weights):
+    """
+    Compute final scores and confidences for a batch of emails.
+
+    Args:
+        scores: float64 array of shape (n, 5) with content, link, behavior,
+            header and QR scores per email
+        weights: float64 array of the five matching agent weights
+
+    Returns:
+        Tuple of (final_scores, confidences) float64 arrays of length n
+    """
+    n = scores.shape[0]
+    k = 5
+    final_scores = np.empty(n, dtype=np.float64)
+    confidences = np.empty(n, dtype=np.float64)
+
+    for i in range(n):
+        # Weighted final score, accumulated in the same order as orchestrate()
+        fs = 0.0
+        total = 0.0
+        for j in range(k):
+            fs += scores[i, j] * weights[j]
+            total += scores[i, j]
+
+        # Population std of the agent scores for the agreement bonus
+        mean = total * 0.2
+        variance = 0.0
+        for j in range(k):
+            variance += (scores[i, j] - mean) ** 2
+        score_std = (variance * 0.2) ** 0.5
+
+        # Bonus for high individual scores
+        high_score_bonus = 0.0
+        for j in range(k):
+            if scores[i, j] >= 0.8:
+                high_score_bonus += 0.05
+
+        confidence = 0.6 + (fs * 0.3) + max(0, 0.1 - score_std) + high_score_bonus
+        final_scores[i] = fs
+        confidences[i] = min(0.99, confidence)
+
+    return final_scores, confidences
+
+
+# Legacy orchestrator actions, indexed by the code decide_action returns
+ACTIONS = ("ALLOW", "FLAG", "QUARANTINE", "BLOCK")
+
+# Header verdict codes accepted by decide_action
+VERDICT_NORMAL = 0
+VERDICT_IDENTITY_MISMATCH = 1
+VERDICT_SUSPICIOUS_ROUTING = 2
+
+# Header agent verdicts with a code of their own; anything else is normal
+VERDICT_CODES = {
+    'identity mismatch': VERDICT_IDENTITY_MISMATCH,
+    'suspicious routing': VERDICT_SUSPICIOUS_ROUTING
+}
+
+
+def _decide_action(final_score, behavior_score, behavior_confidence, link_score, link_ip_count,
+                   header_score, header_verdict, qr_score, qr_suspicious_count):
+    """
+    Pick the legacy orchestrator action for one email.
+
+    Returns:
+        Index into ACTIONS (0 ALLOW, 1 FLAG, 2 QUARANTINE, 3 BLOCK)
+    """
+    # Base action from the score thresholds (0.3 FLAG, 0.6 QUARANTINE,
+    # 0.8 BLOCK), counted branchlessly
+    action = (final_score >= 0.3) + (final_score >= 0.6) + (final_score >= 0.8)
+
+    # Escalations move ALLOW -> FLAG -> QUARANTINE, never into BLOCK
+    if behavior_score >= 0.7 and behavior_confidence >= 0.8 and action < 2:
+        action += 1
+
+    if link_score >= 0.8 and link_ip_count > 0:
+        action = 3
+
+    # Header override rules
+    if header_score >= 0.8:
+        if header_verdict == VERDICT_IDENTITY_MISMATCH:
+            action = 3
+        elif header_verdict == VERDICT_SUSPICIOUS_ROUTING and action < 2:
+            action += 1
+
+    # QR code override rules
+    if qr_score >= 0.8 and qr_suspicious_count > 0 and action < 2:
+        action += 1
+
+    return action
+
+
+def _assess(weights, content_score, link_score, link_confidence, link_ip_count,
+            behavior_score, behavior_confidence, header_score, header_confidence,
+            header_verdict, qr_score, qr_confidence, qr_suspicious_count):
+    """
+    Full legacy orchestrator assessment for one email in a single call.
+
+    Args:
+        weights: Tuple of the five agent weights (content, link, behavior,
+            header, QR)
+
+    Returns:
+        Tuple of (final_score, action index into ACTIONS, confidence)
+    """
+    w_content, w_link, w_behavior, w_header, w_qr = weights
+
+    # Weighted average of agent scores
+    final_score = (
+        content_score * w_content +
+        link_score * w_link +
+        behavior_score * w_behavior +
+        header_score * w_header +
+        qr_score * w_qr
+    )
+
+    # Content agent doesn't provide confidence, use score as proxy
+    content_confidence = min(0.9, content_score + 0.1)
+    confidence = (
+        content_confidence * w_content +
+        link_confidence * w_link +
+        behavior_confidence * w_behavior +
+        header_confidence * w_header +
+        qr_confidence * w_qr
+    )
+
+    action = decide_action(final_score, behavior_score, behavior_confidence, link_score,
+                           link_ip_count, header_score, header_verdict, qr_score,
+                           qr_suspicious_count)
+    return final_score, action, confidence
+
+
+if _NUMBA_AVAILABLE:
+    score_batch = njit(cache=True)(_score_batch)
+    decide_action = njit(cache=True)(_decide_action)
+    # Compiled after decide_action so the call inside resolves to the kernel
+    assess = njit(cache=True)(_assess)
+    # Compile at import so the first request doesn't pay the JIT cost
+    score_batch(np.zeros((1, 5), dtype=np.float64), np.full(5, 0.2, dtype=np.float64))
+    decide_action(0.0, 0.0, 0.0, 0.0, 0, 0.0, 0, 0.0, 0)
+    assess((0.2, 0.2, 0.2, 0.2, 0.2), 0.0, 0.0, 0.0, 0, 0.0, 0.0, 0.0, 0.0, 0, 0.0, 0.0, 0)
+else:
+    score_batch = _score_batch
+    decide_action = _decide_action
+    assess = _assess
@@ -3,7 +3,6 @@
 Helper script to run the Streamlit app.
 """
 
-import subprocess
 import sys
 import os
 
@@ -33,16 +32,20 @@ def main():
         print("   To stop: Press Ctrl+C")
         print()
         
-        subprocess.run([
-            sys.executable, "-m", "streamlit", "run", 
-            "streamlit_app.py",
-            "--server.port=8501",
-            "--server.address=localhost"
-        ])
+        # Start the server in this process rather than spawning a second
+        # interpreter through "python -m streamlit run"
+        from streamlit.web import bootstrap
+        
+        flag_options = {
+            "server_port": 8501,
+            "server_address": "localhost"
+        }
+        bootstrap.load_config_options(flag_options=flag_options)
+        bootstrap.run("streamlit_app.py", "streamlit run streamlit_app.py", [], flag_options)
         
     except KeyboardInterrupt:
         print("\n👋 Streamlit app stopped.")
-    except FileNotFoundError:
+    except ImportError:
         print("❌ Error: Streamlit not found!")
         print("Please install: pip install streamlit")
         sys.exit(1)
@@ -4,12 +4,62 @@ Streamlit UI for Email Phishing Analysis Service
 
 import streamlit as st
 import requests
+import html
 import json
 import re
+from urllib.parse import urlsplit
 from typing import Dict, Any, List, Optional
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import pandas as pd
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Links in pasted email bodies
+_URL_RE = re.compile(r'https?://[^\s<>"\'\`]+')
+
+# Highlight colors by reason
+_HIGHLIGHT_COLORS = {
+    'suspicious_keyword': '#ff6b6b',
+    'suspicious_pattern': '#ffa726',
+    'high_tfidf_suspicious': '#42a5f5'
+}
+_DEFAULT_HIGHLIGHT_COLOR = '#ff6b6b'
+
+def _span_prefix(reason: str, color: str) -> str:
+    """Opening highlight <span> tag for a reason."""
+    return (f'<span style="background-color: {color}; color: white; padding: 2px 4px; '
+            f'border-radius: 3px; font-weight: bold;" title="{html.escape(reason)}">')
+
+# Opening tags for the known reasons, formatted once
+_SPAN_PREFIXES = {reason: _span_prefix(reason, color) for reason, color in _HIGHLIGHT_COLORS.items()}
+
+# Readable white box around email HTML inside the iframe
+_HTML_WRAP_PRE = ('<div style="background-color: white; color: black; padding: 15px; border: 1px solid #ddd; '
+                  'border-radius: 5px; font-family: Arial, sans-serif; line-height: 1.6; max-width: 100%; '
+                  'overflow-wrap: break-word;">')
+_HTML_WRAP_POST = '</div>'
+
+# Risk banner colors by action
+_RISK_COLORS = {
+    'allow': '#4caf50',
+    'flag': '#ff9800',
+    'quarantine': '#f44336'
+}
+
+# QR content type labels for the QR codes table
+_QR_TYPE_LABELS = {
+    'url': '🔗 URL',
+    'text': '📝 Text',
+    'vcard': '👤 Contact',
+    'wifi': '📶 WiFi',
+    'email': '📧 Email',
+    'phone': '📞 Phone',
+    'sms': '💬 SMS',
+    'app_store': '📱 App Store',
+    'external_image': '🖼️ External Image'
+}
 
 # Configure page
 st.set_page_config(
@@ -18,14 +68,16 @@ st.set_page_config(
     layout="wide"
 )
 
-# Demo email examples  
-DEMO_EMAILS = {
-    "Select a demo email...": {},
-    "Phishing - QR Code Scam": {
-        "subject": "🎁 Exclusive Offer - Scan QR Code to Win $500!",
-        "from": "promotions@exclusive-deals.tk",
-        "to": "user@example.com",
-        "body_html": """<html><body style='background:#f0f0f0; padding:20px;'>
+@st.cache_resource(show_spinner=False)
+def get_demo_emails() -> Dict[str, Dict[str, Any]]:
+    """Demo email examples, built once per process and shared read-only across reruns."""
+    return {
+        "Select a demo email...": {},
+        "Phishing - QR Code Scam": {
+            "subject": "🎁 Exclusive Offer - Scan QR Code to Win $500!",
+            "from": "promotions@exclusive-deals.tk",
+            "to": "user@example.com",
+            "body_html": """<html><body style='background:#f0f0f0; padding:20px;'>
         <div style='background:white; padding:20px; border-radius:10px; text-align:center;'>
         <h1 style='color:#ff4444;'>🎁 EXCLUSIVE OFFER! 🎁</h1>
         <p><strong>Congratulations! You've been selected for our exclusive promotion!</strong></p>
@@ -38,7 +90,7 @@ DEMO_EMAILS = {
         <p style='font-size:12px; color:#999;'>This offer is exclusive and cannot be shared. Act now!</p>
         </div>
         </body></html>""",
-        "body_text": """🎁 EXCLUSIVE OFFER! 🎁
+            "body_text": """🎁 EXCLUSIVE OFFER! 🎁
 
 Congratulations! You've been selected for our exclusive promotion!
 
@@ -49,223 +101,225 @@ Scan the QR code in this email to claim your $500 reward instantly!
 ⏰ Limited time offer! Expires in 24 hours!
 
 This offer is exclusive and cannot be shared. Act now!""",
-        "headers": {
-            "From": "promotions@exclusive-deals.tk",
-            "To": "user@example.com",
-            "Date": "Wed, 21 Oct 2024 16:45:00 +0000",
-            "Subject": "🎁 Exclusive Offer - Scan QR Code to Win $500!",
-            "Message-ID": "<qr-scam-12345@exclusive-deals.tk>"
-        },
-        "links": []
-    },
-    "Legitimate - Meeting Invitation": {
-        "subject": "Team Meeting Tomorrow - 2 PM",
-        "from": "sarah.johnson@company.com",
-        "to": "team@company.com", 
-        "body_html": "<html><body><p>Hi Team,</p><p>Just a reminder that we have our weekly team meeting tomorrow at 2 PM in Conference Room A.</p><p>Agenda:</p><ul><li>Project updates</li><li>Q4 planning</li><li>New hire introductions</li></ul><p>Best regards,<br>Sarah</p></body></html>",
-        "body_text": "Hi Team,\n\nJust a reminder that we have our weekly team meeting tomorrow at 2 PM in Conference Room A.\n\nAgenda:\n- Project updates\n- Q4 planning\n- New hire introductions\n\nBest regards,\nSarah",
-        "headers": {
-            "From": "sarah.johnson@company.com",
-            "To": "team@company.com",
-            "Date": "Wed, 21 Oct 2024 10:30:00 +0000",
-            "Message-ID": "<meeting-reminder-12345@company.com>",
-            "Subject": "Team Meeting Tomorrow - 2 PM"
+            "headers": {
+                "From": "promotions@exclusive-deals.tk",
+                "To": "user@example.com",
+                "Date": "Wed, 21 Oct 2024 16:45:00 +0000",
+                "Subject": "🎁 Exclusive Offer - Scan QR Code to Win $500!",
+                "Message-ID": "<qr-scam-12345@exclusive-deals.tk>"
+            },
+            "links": []
         },
-        "links": []
-    },
-    "Phishing - Fake PayPal Alert": {
-        "subject": "URGENT: Your PayPal account will be suspended!",
-        "from": "PayPal Security <security@paypal-verification.tk>", 
-        "to": "user@example.com",
-        "body_html": "<html><body><div style='background:#003087;color:white;padding:20px'><h2>PayPal Security Alert</h2></div><p><strong>URGENT ACTION REQUIRED</strong></p><p>Dear PayPal User,</p><p>We have detected suspicious activity on your account. Your account will be <span style='color:red;font-weight:bold'>PERMANENTLY SUSPENDED</span> within 24 hours unless you verify your identity immediately.</p><p><a href='http://192.168.1.100/paypal-verify' style='background:#0070ba;color:white;padding:10px 20px;text-decoration:none'>VERIFY ACCOUNT NOW</a></p><p>If you do not act within 24 hours, you will lose access to your account forever.</p><p>Thank you,<br>PayPal Security Team</p></body></html>",
-        "body_text": "URGENT ACTION REQUIRED\n\nDear PayPal User,\n\nWe have detected suspicious activity on your account. Your account will be PERMANENTLY SUSPENDED within 24 hours unless you verify your identity immediately.\n\nClick here to verify: http://192.168.1.100/paypal-verify\n\nIf you do not act within 24 hours, you will lose access to your account forever.\n\nThank you,\nPayPal Security Team",
-        "headers": {
-            "From": "PayPal Security <security@paypal-verification.tk>",
-            "To": "user@example.com", 
-            "Date": "Wed, 21 Oct 2024 03:15:00 +0000",
-            "Reply-To": "noreply@suspicious-sender.com",
-            "Subject": "URGENT: Your PayPal account will be suspended!"
+        "Legitimate - Meeting Invitation": {
+            "subject": "Team Meeting Tomorrow - 2 PM",
+            "from": "sarah.johnson@company.com",
+            "to": "team@company.com", 
+            "body_html": "<html><body><p>Hi Team,</p><p>Just a reminder that we have our weekly team meeting tomorrow at 2 PM in Conference Room A.</p><p>Agenda:</p><ul><li>Project updates</li><li>Q4 planning</li><li>New hire introductions</li></ul><p>Best regards,<br>Sarah</p></body></html>",
+            "body_text": "Hi Team,\n\nJust a reminder that we have our weekly team meeting tomorrow at 2 PM in Conference Room A.\n\nAgenda:\n- Project updates\n- Q4 planning\n- New hire introductions\n\nBest regards,\nSarah",
+            "headers": {
+                "From": "sarah.johnson@company.com",
+                "To": "team@company.com",
+                "Date": "Wed, 21 Oct 2024 10:30:00 +0000",
+                "Message-ID": "<meeting-reminder-12345@company.com>",
+                "Subject": "Team Meeting Tomorrow - 2 PM"
+            },
+            "links": []
         },
-        "links": ["http://192.168.1.100/paypal-verify"]
-    },
-    "Phishing - Lottery Scam": {
-        "subject": "🎉 CONGRATULATIONS! You've Won $1,000,000!!!",
-        "from": "International Lottery Commission <winner@lottery-commission.ml>",
-        "to": "lucky.winner@example.com",
-        "body_html": "<html><body style='background:#gold'><h1 style='color:red'>🎉 CONGRATULATIONS! 🎉</h1><p><strong>YOU ARE THE LUCKY WINNER!</strong></p><p>The International Lottery Commission is pleased to inform you that you have won the sum of <strong style='color:green;font-size:20px'>$1,000,000.00</strong> in our monthly lottery draw!</p><p>Your winning numbers were: 7-14-23-35-42-49</p><p><strong>CLAIM YOUR PRIZE NOW!</strong></p><p>To claim your winnings, click here: <a href='https://bit.ly/claim-million'>CLAIM NOW</a></p><p>This offer expires in 48 hours!</p><p>Lottery Reference: LTC/2024/WIN/001</p></body></html>",
-        "body_text": "🎉 CONGRATULATIONS! 🎉\n\nYOU ARE THE LUCKY WINNER!\n\nThe International Lottery Commission is pleased to inform you that you have won the sum of $1,000,000.00 in our monthly lottery draw!\n\nYour winning numbers were: 7-14-23-35-42-49\n\nCLAIM YOUR PRIZE NOW!\n\nTo claim your winnings, visit: https://bit.ly/claim-million\n\nThis offer expires in 48 hours!\n\nLottery Reference: LTC/2024/WIN/001",
-        "headers": {
-            "From": "International Lottery Commission <winner@lottery-commission.ml>",
-            "To": "lucky.winner@example.com",
-            "Date": "Wed, 21 Oct 2024 15:45:00 +0000",
-            "Subject": "🎉 CONGRATULATIONS! You've Won $1,000,000!!!"
+        "Phishing - Fake PayPal Alert": {
+            "subject": "URGENT: Your PayPal account will be suspended!",
+            "from": "PayPal Security <security@paypal-verification.tk>", 
+            "to": "user@example.com",
+            "body_html": "<html><body><div style='background:#003087;color:white;padding:20px'><h2>PayPal Security Alert</h2></div><p><strong>URGENT ACTION REQUIRED</strong></p><p>Dear PayPal User,</p><p>We have detected suspicious activity on your account. Your account will be <span style='color:red;font-weight:bold'>PERMANENTLY SUSPENDED</span> within 24 hours unless you verify your identity immediately.</p><p><a href='http://192.168.1.100/paypal-verify' style='background:#0070ba;color:white;padding:10px 20px;text-decoration:none'>VERIFY ACCOUNT NOW</a></p><p>If you do not act within 24 hours, you will lose access to your account forever.</p><p>Thank you,<br>PayPal Security Team</p></body></html>",
+            "body_text": "URGENT ACTION REQUIRED\n\nDear PayPal User,\n\nWe have detected suspicious activity on your account. Your account will be PERMANENTLY SUSPENDED within 24 hours unless you verify your identity immediately.\n\nClick here to verify: http://192.168.1.100/paypal-verify\n\nIf you do not act within 24 hours, you will lose access to your account forever.\n\nThank you,\nPayPal Security Team",
+            "headers": {
+                "From": "PayPal Security <security@paypal-verification.tk>",
+                "To": "user@example.com", 
+                "Date": "Wed, 21 Oct 2024 03:15:00 +0000",
+                "Reply-To": "noreply@suspicious-sender.com",
+                "Subject": "URGENT: Your PayPal account will be suspended!"
+            },
+            "links": ["http://192.168.1.100/paypal-verify"]
         },
-        "links": ["https://bit.ly/claim-million"]
-    },
-    "Suspicious - Microsoft Spoofing": {
-        "subject": "Microsoft Account Security Alert",
-        "from": "Microsoft Security <alerts@microsoft-security.tk>",
-        "to": "user@company.com",
-        "body_html": "<html><body><div style='background:#0078d4;color:white;padding:15px'><h3>Microsoft Account Security</h3></div><p>Hello,</p><p>We detected an unusual sign-in to your Microsoft account from a new device:</p><ul><li>Location: Russia</li><li>Device: Unknown Device</li><li>Time: Today at 2:30 AM</li></ul><p>If this wasn't you, please secure your account immediately by clicking the link below:</p><p><a href='https://microsft-secure.tk/verify'>Secure Your Account</a></p><p>If you don't recognize this activity, your account may be compromised.</p><p>Thanks,<br>Microsoft Account Team</p></body></html>",
-        "body_text": "Hello,\n\nWe detected an unusual sign-in to your Microsoft account from a new device:\n\n- Location: Russia\n- Device: Unknown Device  \n- Time: Today at 2:30 AM\n\nIf this wasn't you, please secure your account immediately: https://microsft-secure.tk/verify\n\nIf you don't recognize this activity, your account may be compromised.\n\nThanks,\nMicrosoft Account Team",
-        "headers": {
-            "From": "Microsoft Security <alerts@microsoft-security.tk>",
-            "To": "user@company.com",
-            "Date": "Wed, 21 Oct 2024 08:30:00 +0000",
-            "Subject": "Microsoft Account Security Alert"
+        "Phishing - Lottery Scam": {
+            "subject": "🎉 CONGRATULATIONS! You've Won $1,000,000!!!",
+            "from": "International Lottery Commission <winner@lottery-commission.ml>",
+            "to": "lucky.winner@example.com",
+            "body_html": "<html><body style='background:#gold'><h1 style='color:red'>🎉 CONGRATULATIONS! 🎉</h1><p><strong>YOU ARE THE LUCKY WINNER!</strong></p><p>The International Lottery Commission is pleased to inform you that you have won the sum of <strong style='color:green;font-size:20px'>$1,000,000.00</strong> in our monthly lottery draw!</p><p>Your winning numbers were: 7-14-23-35-42-49</p><p><strong>CLAIM YOUR PRIZE NOW!</strong></p><p>To claim your winnings, click here: <a href='https://bit.ly/claim-million'>CLAIM NOW</a></p><p>This offer expires in 48 hours!</p><p>Lottery Reference: LTC/2024/WIN/001</p></body></html>",
+            "body_text": "🎉 CONGRATULATIONS! 🎉\n\nYOU ARE THE LUCKY WINNER!\n\nThe International Lottery Commission is pleased to inform you that you have won the sum of $1,000,000.00 in our monthly lottery draw!\n\nYour winning numbers were: 7-14-23-35-42-49\n\nCLAIM YOUR PRIZE NOW!\n\nTo claim your winnings, visit: https://bit.ly/claim-million\n\nThis offer expires in 48 hours!\n\nLottery Reference: LTC/2024/WIN/001",
+            "headers": {
+                "From": "International Lottery Commission <winner@lottery-commission.ml>",
+                "To": "lucky.winner@example.com",
+                "Date": "Wed, 21 Oct 2024 15:45:00 +0000",
+                "Subject": "🎉 CONGRATULATIONS! You've Won $1,000,000!!!"
+            },
+            "links": ["https://bit.ly/claim-million"]
         },
-        "links": ["https://microsft-secure.tk/verify"]
-    },
-    "Legitimate - Newsletter": {
-        "subject": "Your Weekly Tech Newsletter - AI Advances",
-        "from": "TechNews Weekly <newsletter@technews.com>",
-        "to": "subscriber@example.com", 
-        "body_html": "<html><body><div style='background:#f8f9fa;padding:20px'><h2>TechNews Weekly</h2><p>Your trusted source for technology news</p></div><h3>This Week's Headlines</h3><ul><li><a href='https://technews.com/ai-breakthrough'>Major AI Breakthrough in Natural Language Processing</a></li><li><a href='https://technews.com/quantum-computing'>Quantum Computing Milestone Reached</a></li><li><a href='https://technews.com/cybersecurity'>New Cybersecurity Framework Released</a></li></ul><p>Read more at <a href='https://technews.com'>TechNews.com</a></p><p><small>Unsubscribe: <a href='https://technews.com/unsubscribe?id=12345'>Click here</a></small></p></body></html>",
-        "body_text": "TechNews Weekly\nYour trusted source for technology news\n\nThis Week's Headlines:\n\n- Major AI Breakthrough in Natural Language Processing\n  https://technews.com/ai-breakthrough\n\n- Quantum Computing Milestone Reached\n  https://technews.com/quantum-computing\n\n- New Cybersecurity Framework Released\n  https://technews.com/cybersecurity\n\nRead more at https://technews.com\n\nUnsubscribe: https://technews.com/unsubscribe?id=12345",
-        "headers": {
-            "From": "TechNews Weekly <newsletter@technews.com>",
-            "To": "subscriber@example.com",
-            "Date": "Wed, 21 Oct 2024 12:00:00 +0000",
-            "Message-ID": "<newsletter-2024-42@technews.com>",
-            "List-Unsubscribe": "<https://technews.com/unsubscribe?id=12345>",
-            "Subject": "Your Weekly Tech Newsletter - AI Advances"
+        "Suspicious - Microsoft Spoofing": {
+            "subject": "Microsoft Account Security Alert",
+            "from": "Microsoft Security <alerts@microsoft-security.tk>",
+            "to": "user@company.com",
+            "body_html": "<html><body><div style='background:#0078d4;color:white;padding:15px'><h3>Microsoft Account Security</h3></div><p>Hello,</p><p>We detected an unusual sign-in to your Microsoft account from a new device:</p><ul><li>Location: Russia</li><li>Device: Unknown Device</li><li>Time: Today at 2:30 AM</li></ul><p>If this wasn't you, please secure your account immediately by clicking the link below:</p><p><a href='https://microsft-secure.tk/verify'>Secure Your Account</a></p><p>If you don't recognize this activity, your account may be compromised.</p><p>Thanks,<br>Microsoft Account Team</p></body></html>",
+            "body_text": "Hello,\n\nWe detected an unusual sign-in to your Microsoft account from a new device:\n\n- Location: Russia\n- Device: Unknown Device  \n- Time: Today at 2:30 AM\n\nIf this wasn't you, please secure your account immediately: https://microsft-secure.tk/verify\n\nIf you don't recognize this activity, your account may be compromised.\n\nThanks,\nMicrosoft Account Team",
+            "headers": {
+                "From": "Microsoft Security <alerts@microsoft-security.tk>",
+                "To": "user@company.com",
+                "Date": "Wed, 21 Oct 2024 08:30:00 +0000",
+                "Subject": "Microsoft Account Security Alert"
+            },
+            "links": ["https://microsft-secure.tk/verify"]
         },
-        "links": [
-            "https://technews.com/ai-breakthrough",
-            "https://technews.com/quantum-computing", 
-            "https://technews.com/cybersecurity",
-            "https://technews.com",
-            "https://technews.com/unsubscribe?id=12345"
-        ]
-    },
-    "Header Analysis Demo - Identity Mismatch": {
-        "subject": "URGENT: Your PayPal account will be suspended!",
-        "from": "PayPal Security <security@paypal.com>",
-        "to": "user@example.com",
-        "body_html": "<html><body><div style='background:#003087;color:white;padding:20px'><h2>PayPal Security Alert</h2></div><p><strong>URGENT ACTION REQUIRED</strong></p><p>Dear PayPal User,</p><p>We have detected suspicious activity on your account. Your account will be <span style='color:red;font-weight:bold'>PERMANENTLY SUSPENDED</span> within 24 hours unless you verify your identity immediately.</p><p><a href='http://192.168.1.100/paypal-verify' style='background:#0070ba;color:white;padding:10px 20px;text-decoration:none'>VERIFY ACCOUNT NOW</a></p><p>If you do not act within 24 hours, you will lose access to your account forever.</p><p>Thank you,<br>PayPal Security Team</p></body></html>",
-        "body_text": "URGENT ACTION REQUIRED\n\nDear PayPal User,\n\nWe have detected suspicious activity on your account. Your account will be PERMANENTLY SUSPENDED within 24 hours unless you verify your identity immediately.\n\nClick here to verify: http://192.168.1.100/paypal-verify\n\nIf you do not act within 24 hours, you will lose access to your account forever.\n\nThank you,\nPayPal Security Team",
-        "headers": {
-            "From": "PayPal Security <security@paypal.com>",
-            "To": "user@example.com", 
-            "Date": "Wed, 21 Oct 2024 03:15:00 +0000",
-            "Reply-To": "noreply@suspicious-sender.com",
-            "Subject": "URGENT: Your PayPal account will be suspended!",
-            "Message-ID": "<suspicious123@fake-paypal.ru>",
-            "Received": [
-                "from suspicious-server.ru (unknown [192.168.1.100]) by mx.example.com; Mon, 21 Oct 2024 11:00:05 +0000",
-                "from bulk-mailer.sketchy.com by suspicious-server.ru; Mon, 21 Oct 2024 11:00:02 +0000"
-            ],
-            "Return-Path": "<noreply@fake-paypal.ru>",
-            "Authentication-Results": "mx.example.com; dkim=fail; spf=fail; dmarc=fail",
-            "X-Mailer": "BulkMailer Pro v2.1"
-        },
-        "links": ["http://192.168.1.100/paypal-verify"]
-    },
-    "Suspicious Routing - Excessive Hops": {
-        "subject": "Service notification",
-        "from": "notifications@legitimate-service.com",
-        "to": "user@example.com",
-        "body_html": "<html><body><p>This is a service notification from a legitimate service.</p></body></html>",
-        "body_text": "This is a service notification from a legitimate service.",
-        "headers": {
-            "From": "notifications@legitimate-service.com",
-            "To": "user@example.com",
-            "Subject": "Service notification",
-            "Date": "Mon, 21 Oct 2024 12:00:00 +0000",
-            "Message-ID": "<notification456@legitimate-service.com>",
-            "Received": [
-                "from final-server.com by mx.example.com; Mon, 21 Oct 2024 12:00:15 +0000",
-                "from relay9.suspicious.tk by final-server.com; Mon, 21 Oct 2024 12:00:12 +0000",
-                "from relay8.bulk.ml by relay9.suspicious.tk; Mon, 21 Oct 2024 12:00:10 +0000",
-                "from relay7.spam.gq by relay8.bulk.ml; Mon, 21 Oct 2024 12:00:08 +0000",
-                "from relay6.mass.cf by relay7.spam.gq; Mon, 21 Oct 2024 12:00:06 +0000",
-                "from relay5.campaign.ga by relay6.mass.cf; Mon, 21 Oct 2024 12:00:04 +0000",
-                "from relay4.marketing.ru by relay5.campaign.ga; Mon, 21 Oct 2024 12:00:02 +0000",
-                "from relay3.bulk.cn by relay4.marketing.ru; Mon, 21 Oct 2024 12:00:00 +0000",
-                "from relay2.spam.cc by relay3.bulk.cn; Mon, 21 Oct 2024 11:59:58 +0000",
-                "from relay1.suspicious.pw by relay2.spam.cc; Mon, 21 Oct 2024 11:59:56 +0000",
-                "from origin.legitimate-service.com by relay1.suspicious.pw; Mon, 21 Oct 2024 11:59:54 +0000"
+        "Legitimate - Newsletter": {
+            "subject": "Your Weekly Tech Newsletter - AI Advances",
+            "from": "TechNews Weekly <newsletter@technews.com>",
+            "to": "subscriber@example.com", 
+            "body_html": "<html><body><div style='background:#f8f9fa;padding:20px'><h2>TechNews Weekly</h2><p>Your trusted source for technology news</p></div><h3>This Week's Headlines</h3><ul><li><a href='https://technews.com/ai-breakthrough'>Major AI Breakthrough in Natural Language Processing</a></li><li><a href='https://technews.com/quantum-computing'>Quantum Computing Milestone Reached</a></li><li><a href='https://technews.com/cybersecurity'>New Cybersecurity Framework Released</a></li></ul><p>Read more at <a href='https://technews.com'>TechNews.com</a></p><p><small>Unsubscribe: <a href='https://technews.com/unsubscribe?id=12345'>Click here</a></small></p></body></html>",
+            "body_text": "TechNews Weekly\nYour trusted source for technology news\n\nThis Week's Headlines:\n\n- Major AI Breakthrough in Natural Language Processing\n  https://technews.com/ai-breakthrough\n\n- Quantum Computing Milestone Reached\n  https://technews.com/quantum-computing\n\n- New Cybersecurity Framework Released\n  https://technews.com/cybersecurity\n\nRead more at https://technews.com\n\nUnsubscribe: https://technews.com/unsubscribe?id=12345",
+            "headers": {
+                "From": "TechNews Weekly <newsletter@technews.com>",
+                "To": "subscriber@example.com",
+                "Date": "Wed, 21 Oct 2024 12:00:00 +0000",
+                "Message-ID": "<newsletter-2024-42@technews.com>",
+                "List-Unsubscribe": "<https://technews.com/unsubscribe?id=12345>",
+                "Subject": "Your Weekly Tech Newsletter - AI Advances"
+            },
+            "links": [
+                "https://technews.com/ai-breakthrough",
+                "https://technews.com/quantum-computing", 
+                "https://technews.com/cybersecurity",
+                "https://technews.com",
+                "https://technews.com/unsubscribe?id=12345"
             ]
         },
-        "links": []
+        "Header Analysis Demo - Identity Mismatch": {
+            "subject": "URGENT: Your PayPal account will be suspended!",
+            "from": "PayPal Security <security@paypal.com>",
+            "to": "user@example.com",
+            "body_html": "<html><body><div style='background:#003087;color:white;padding:20px'><h2>PayPal Security Alert</h2></div><p><strong>URGENT ACTION REQUIRED</strong></p><p>Dear PayPal User,</p><p>We have detected suspicious activity on your account. Your account will be <span style='color:red;font-weight:bold'>PERMANENTLY SUSPENDED</span> within 24 hours unless you verify your identity immediately.</p><p><a href='http://192.168.1.100/paypal-verify' style='background:#0070ba;color:white;padding:10px 20px;text-decoration:none'>VERIFY ACCOUNT NOW</a></p><p>If you do not act within 24 hours, you will lose access to your account forever.</p><p>Thank you,<br>PayPal Security Team</p></body></html>",
+            "body_text": "URGENT ACTION REQUIRED\n\nDear PayPal User,\n\nWe have detected suspicious activity on your account. Your account will be PERMANENTLY SUSPENDED within 24 hours unless you verify your identity immediately.\n\nClick here to verify: http://192.168.1.100/paypal-verify\n\nIf you do not act within 24 hours, you will lose access to your account forever.\n\nThank you,\nPayPal Security Team",
+            "headers": {
+                "From": "PayPal Security <security@paypal.com>",
+                "To": "user@example.com", 
+                "Date": "Wed, 21 Oct 2024 03:15:00 +0000",
+                "Reply-To": "noreply@suspicious-sender.com",
+                "Subject": "URGENT: Your PayPal account will be suspended!",
+                "Message-ID": "<suspicious123@fake-paypal.ru>",
+                "Received": [
+                    "from suspicious-server.ru (unknown [192.168.1.100]) by mx.example.com; Mon, 21 Oct 2024 11:00:05 +0000",
+                    "from bulk-mailer.sketchy.com by suspicious-server.ru; Mon, 21 Oct 2024 11:00:02 +0000"
+                ],
+                "Return-Path": "<noreply@fake-paypal.ru>",
+                "Authentication-Results": "mx.example.com; dkim=fail; spf=fail; dmarc=fail",
+                "X-Mailer": "BulkMailer Pro v2.1"
+            },
+            "links": ["http://192.168.1.100/paypal-verify"]
+        },
+        "Suspicious Routing - Excessive Hops": {
+            "subject": "Service notification",
+            "from": "notifications@legitimate-service.com",
+            "to": "user@example.com",
+            "body_html": "<html><body><p>This is a service notification from a legitimate service.</p></body></html>",
+            "body_text": "This is a service notification from a legitimate service.",
+            "headers": {
+                "From": "notifications@legitimate-service.com",
+                "To": "user@example.com",
+                "Subject": "Service notification",
+                "Date": "Mon, 21 Oct 2024 12:00:00 +0000",
+                "Message-ID": "<notification456@legitimate-service.com>",
+                "Received": [
+                    "from final-server.com by mx.example.com; Mon, 21 Oct 2024 12:00:15 +0000",
+                    "from relay9.suspicious.tk by final-server.com; Mon, 21 Oct 2024 12:00:12 +0000",
+                    "from relay8.bulk.ml by relay9.suspicious.tk; Mon, 21 Oct 2024 12:00:10 +0000",
+                    "from relay7.spam.gq by relay8.bulk.ml; Mon, 21 Oct 2024 12:00:08 +0000",
+                    "from relay6.mass.cf by relay7.spam.gq; Mon, 21 Oct 2024 12:00:06 +0000",
+                    "from relay5.campaign.ga by relay6.mass.cf; Mon, 21 Oct 2024 12:00:04 +0000",
+                    "from relay4.marketing.ru by relay5.campaign.ga; Mon, 21 Oct 2024 12:00:02 +0000",
+                    "from relay3.bulk.cn by relay4.marketing.ru; Mon, 21 Oct 2024 12:00:00 +0000",
+                    "from relay2.spam.cc by relay3.bulk.cn; Mon, 21 Oct 2024 11:59:58 +0000",
+                    "from relay1.suspicious.pw by relay2.spam.cc; Mon, 21 Oct 2024 11:59:56 +0000",
+                    "from origin.legitimate-service.com by relay1.suspicious.pw; Mon, 21 Oct 2024 11:59:54 +0000"
+                ]
+            },
+            "links": []
+        }
+    }
+
+@st.cache_resource(show_spinner=False)
+def get_demo_names() -> tuple:
+    """Demo names for the selectbox, in display order."""
+    return tuple(get_demo_emails())
+
+@st.cache_resource(show_spinner=False)
+def get_demo_texts() -> Dict[str, str]:
+    """Raw-email text shown in the text area for each demo, built once per process."""
+    return {
+        name: f"""Subject: {email.get('subject', '')}
+From: {email.get('from', '')}
+To: {email.get('to', '')}
+
+{email.get('body_text', '')}"""
+        for name, email in get_demo_emails().items()
     }
-}
 
 def highlight_text(text: str, highlights: List[Dict]) -> str:
-    """Apply highlights to text using HTML spans."""
+    """Apply highlights to text using HTML spans; all of the text is HTML-escaped."""
     if not highlights:
-        return text
+        return html.escape(text)
     
-    # Sort highlights by start position (reverse order for replacement)
-    sorted_highlights = sorted(highlights, key=lambda x: x['start'], reverse=True)
-    
-    highlighted_text = text
-    for highlight in sorted_highlights:
+    # Walk the text once in start order, joining the pieces at the end.
+    # Offsets index the raw text, so each piece is escaped as it is cut.
+    parts = []
+    pos = 0
+    for highlight in sorted(highlights, key=lambda x: x['start']):
         start = highlight['start']
-        end = highlight['end']
+        if start < pos:
+            # Overlaps a span already emitted
+            continue
         reason = highlight['reason']
-        token = highlight['token']
+        prefix = _SPAN_PREFIXES.get(reason)
+        if prefix is None:
+            prefix = _span_prefix(reason, _DEFAULT_HIGHLIGHT_COLOR)
         
-        # Choose color based on reason
-        color_map = {
-            'suspicious_keyword': '#ff6b6b',
-            'suspicious_pattern': '#ffa726', 
-            'high_tfidf_suspicious': '#42a5f5'
-        }
-        color = color_map.get(reason, '#ff6b6b')
-        
-        # Replace with highlighted span
-        replacement = f'<span style="background-color: {color}; color: white; padding: 2px 4px; border-radius: 3px; font-weight: bold;" title="{reason}">{token}</span>'
-        highlighted_text = highlighted_text[:start] + replacement + highlighted_text[end:]
-    
-    return highlighted_text
-
-def create_progress_bar(score: float, label: str, color: str = "blue") -> go.Figure:
-    """Create a horizontal progress bar."""
-    fig = go.Figure()
-    
-    # Background bar
-    fig.add_trace(go.Bar(
-        y=[label],
-        x=[1.0],
-        orientation='h',
-        marker=dict(color='lightgray'),
-        showlegend=False,
-        hoverinfo='skip'
-    ))
-    
-    # Progress bar
-    fig.add_trace(go.Bar(
-        y=[label],
-        x=[score],
-        orientation='h',
-        marker=dict(color=color),
-        showlegend=False,
-        text=[f'{score:.2f}'],
-        textposition='inside',
-        hovertemplate=f'<b>{label}</b><br>Score: {score:.3f}<extra></extra>'
-    ))
-    
-    fig.update_layout(
-        barmode='overlay',
-        height=60,
-        margin=dict(l=0, r=0, t=0, b=0),
-        xaxis=dict(range=[0, 1], showticklabels=False, showgrid=False),
-        yaxis=dict(showticklabels=False, showgrid=False),
-        plot_bgcolor='rgba(0,0,0,0)',
-        paper_bgcolor='rgba(0,0,0,0)'
-    )
+        parts.append(html.escape(text[pos:start]))
+        parts.append(prefix)
+        parts.append(html.escape(highlight['token']))
+        parts.append('</span>')
+        pos = highlight['end']
     
-    return fig
+    parts.append(html.escape(text[pos:]))
+    return ''.join(parts)
+
+def create_progress_bar(score: float, label: str, color: str = "blue") -> str:
+    """Create a horizontal progress bar as an HTML snippet."""
+    width = min(1.0, max(0.0, score)) * 100
+    return (f'<div title="{label} - Score: {score:.3f}" style="background-color: lightgray; border-radius: 4px; height: 28px; margin: 16px 0;">'
+            f'<div style="width: {width:.1f}%; min-width: 2.5em; height: 100%; background-color: {color}; color: white; '
+            f'border-radius: 4px; padding: 4px 8px; box-sizing: border-box; font-size: 0.85em; text-align: right;">{score:.2f}</div></div>')
 
 def get_risk_color(action: str) -> str:
     """Get color for risk level."""
-    colors = {
-        'allow': '#4caf50',
-        'flag': '#ff9800', 
-        'quarantine': '#f44336'
+    return _RISK_COLORS.get(action.lower(), '#666666')
+
+def _truncate(text: str, limit: int = 50) -> str:
+    """Shorten text for a table cell, marking the cut with '...'."""
+    return text if len(text) <= limit else text[:limit] + '...'
+
+def _first_reasons(reasons: Optional[List[str]]) -> str:
+    """First two reasons for a table cell."""
+    return '; '.join(reasons[:2]) if reasons else ''
+
+def _json_preview(email_data: Dict[str, Any], limit: int = 500) -> Dict[str, Any]:
+    """Copy of the email data with long string fields cut to limit characters."""
+    return {
+        key: f"{value[:limit]}... ({len(value):,} chars)" if isinstance(value, str) and len(value) > limit else value
+        for key, value in email_data.items()
     }
-    return colors.get(action.lower(), '#666666')
+
+def _show_table(columns: Dict[str, List[str]]) -> None:
+    """Render columns as a static table, or a scrollable grid when there are many rows."""
+    if len(next(iter(columns.values()))) <= 50:
+        st.table(columns)
+    else:
+        st.dataframe(columns, use_container_width=True)
 
 def display_links_table(links_data: List[Dict]) -> None:
     """Display links analysis in a table."""
@@ -273,41 +327,38 @@ def display_links_table(links_data: List[Dict]) -> None:
         st.info("No links found in email")
         return
     
-    # Prepare data for table
-    table_data = []
+    # Prepare data for table, one list per column
+    urls, domains, scores, risk_levels, reasons = [], [], [], [], []
     for link in links_data:
         # Handle both string URLs and dictionary objects
         if isinstance(link, str):
             # If link is just a URL string, create a basic entry
-            url = link
-            table_data.append({
-                'URL': url[:50] + ('...' if len(url) > 50 else ''),
-                'Domain': url.split('/')[2] if '//' in url else 'Unknown',
-                'Risk Score': 'N/A',
-                'Risk Level': '🟡 Medium',
-                'Reasons': 'Basic URL detected'
-            })
+            urls.append(_truncate(link))
+            domains.append(urlsplit(link).netloc or 'Unknown')
+            scores.append('N/A')
+            risk_levels.append('🟡 Medium')
+            reasons.append('Basic URL detected')
         elif isinstance(link, dict):
             # If link is a dictionary with analysis data
             score = link.get('score', 0.0)
-            risk_level = "🔴 High" if score >= 0.7 else "🟡 Medium" if score >= 0.4 else "🟢 Low"
-            url = link.get('url', 'Unknown')
-            
-            table_data.append({
-                'URL': url[:50] + ('...' if len(url) > 50 else ''),
-                'Domain': link.get('domain', 'Unknown'),
-                'Risk Score': f"{score:.2f}",
-                'Risk Level': risk_level,
-                'Reasons': '; '.join(link.get('reasons', [])[:2])  # Show first 2 reasons
-            })
+            urls.append(_truncate(link.get('url', 'Unknown')))
+            domains.append(link.get('domain', 'Unknown'))
+            scores.append(f"{score:.2f}")
+            risk_levels.append("🔴 High" if score >= 0.7 else "🟡 Medium" if score >= 0.4 else "🟢 Low")
+            reasons.append(_first_reasons(link.get('reasons')))
         else:
             # Handle unexpected data types
             st.warning(f"Unexpected link data type: {type(link)}")
             continue
     
-    if table_data:
-        df = pd.DataFrame(table_data)
-        st.dataframe(df, use_container_width=True)
+    if urls:
+        _show_table({
+            'URL': urls,
+            'Domain': domains,
+            'Risk Score': scores,
+            'Risk Level': risk_levels,
+            'Reasons': reasons
+        })
 
 
 def display_qr_codes_table(qr_codes_data: List[Dict]) -> None:
@@ -316,44 +367,37 @@ def display_qr_codes_table(qr_codes_data: List[Dict]) -> None:
         st.info("No QR codes found in email")
         return
     
-    # Prepare data for table
-    table_data = []
+    # Prepare data for table, one list per column
+    contents, types, locations, scores, risk_levels, reasons = [], [], [], [], [], []
     for qr_code in qr_codes_data:
         if isinstance(qr_code, dict):
             score = qr_code.get('score', 0.0)
-            risk_level = "🔴 High" if score >= 0.7 else "🟡 Medium" if score >= 0.4 else "🟢 Low"
-            content = qr_code.get('content', 'Unknown')
             content_type = qr_code.get('content_type', 'unknown')
-            location = qr_code.get('location', 'unknown')
             
             # Format content type for display
-            content_type_display = {
-                'url': '🔗 URL',
-                'text': '📝 Text', 
-                'vcard': '👤 Contact',
-                'wifi': '📶 WiFi',
-                'email': '📧 Email',
-                'phone': '📞 Phone',
-                'sms': '💬 SMS',
-                'app_store': '📱 App Store',
-                'external_image': '🖼️ External Image'
-            }.get(content_type, f'❓ {content_type.title()}')
+            content_type_display = _QR_TYPE_LABELS.get(content_type)
+            if content_type_display is None:
+                content_type_display = f'❓ {content_type.title()}'
             
-            table_data.append({
-                'Content': content[:50] + ('...' if len(content) > 50 else ''),
-                'Type': content_type_display,
-                'Location': location.replace('_', ' ').title(),
-                'Risk Score': f"{score:.2f}",
-                'Risk Level': risk_level,
-                'Reasons': '; '.join(qr_code.get('reasons', [])[:2])  # Show first 2 reasons
-            })
+            contents.append(_truncate(qr_code.get('content', 'Unknown')))
+            types.append(content_type_display)
+            locations.append(qr_code.get('location', 'unknown').replace('_', ' ').title())
+            scores.append(f"{score:.2f}")
+            risk_levels.append("🔴 High" if score >= 0.7 else "🟡 Medium" if score >= 0.4 else "🟢 Low")
+            reasons.append(_first_reasons(qr_code.get('reasons')))
         else:
             st.warning(f"Unexpected QR code data type: {type(qr_code)}")
             continue
     
-    if table_data:
-        df = pd.DataFrame(table_data)
-        st.dataframe(df, use_container_width=True)
+    if contents:
+        _show_table({
+            'Content': contents,
+            'Type': types,
+            'Location': locations,
+            'Risk Score': scores,
+            'Risk Level': risk_levels,
+            'Reasons': reasons
+        })
 
 def parse_email_text(email_text: str) -> Dict[str, Any]:
     """Parse raw email text into structured format."""
@@ -365,11 +409,11 @@ def parse_email_text(email_text: str) -> Dict[str, Any]:
     
     for line in lines:
         if in_headers:
-            if line.strip() == '':
+            if not line.strip():
                 in_headers = False
                 continue
-            if ':' in line:
-                key, value = line.split(':', 1)
+            key, sep, value = line.partition(':')
+            if sep:
                 headers[key.strip()] = value.strip()
         else:
             body_lines.append(line)
@@ -382,18 +426,338 @@ def parse_email_text(email_text: str) -> Dict[str, Any]:
     to_addr = headers.get('To', '')
     
     # Simple link extraction
-    links = re.findall(r'https?://[^\s<>"\'\`]+', body_text)
+    links = _URL_RE.findall(body_text)
     
     return {
         'subject': subject,
         'from': from_addr,
         'to': to_addr,
-        'body_html': f'<p>{body_text.replace(chr(10), "</p><p>")}</p>',
+        'body_html': '<p>' + body_text.replace('\n', '</p><p>') + '</p>',
         'body_text': body_text,
         'headers': headers,
         'links': links
     }
 
+def _json_loads(data: bytes) -> Any:
+    """Parse JSON bytes, with orjson when it is installed."""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def _json_dumps_sorted(obj: Any) -> bytes:
+    """Serialize to JSON bytes with sorted keys, so equal objects give equal bytes."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+    return json.dumps(obj, sort_keys=True).encode('utf-8')
+
+# Bytes of a non-200 response body shown in the error message
+_ERROR_PREVIEW_BYTES = 512
+
+class APIError(Exception):
+    """Non-200 response from the analysis API."""
+    
+    def __init__(self, status_code: int, text: str):
+        super().__init__(f"{status_code} - {text}")
+        self.status_code = status_code
+        self.text = text
+
+@st.cache_resource(show_spinner=False)
+def get_http_session() -> requests.Session:
+    """Keep-alive HTTP session shared across reruns and sessions."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=1)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+@st.cache_data(ttl=300, max_entries=128, show_spinner=False)
+def analyze_email_cached(api_url: str, email_json: bytes) -> Dict[str, Any]:
+    """
+    POST an email to the analysis API, caching successful results.
+    
+    email_json is the email serialized with sorted keys, so identical emails
+    share a cache entry. Errors are raised rather than returned, so failed
+    requests are never cached.
+    """
+    response = get_http_session().post(
+        f"{api_url}/analyze_email",
+        data=email_json,
+        headers={"Content-Type": "application/json"},
+        timeout=30
+    )
+    if response.status_code != 200:
+        # Decode only the start of the body; error pages can be large HTML
+        preview = response.content[:_ERROR_PREVIEW_BYTES].decode('utf-8', errors='replace')
+        raise APIError(response.status_code, preview)
+    return _json_loads(response.content)
+
+# Detailed result views, in display order
+_RESULT_VIEWS = ("📝 Content Analysis", "🔗 Link Analysis", "👤 Behavior Analysis",
+                 "📧 Header Analysis", "📱 QR Code Analysis", "📧 Original Email")
+
+# Fragment decorator where available (st.fragment, or st.experimental_fragment
+# on 1.33-1.36) so widgets in the results rerun only the results; older
+# Streamlit versions rerun the whole script
+_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
+
+@_fragment
+def render_results(result: Dict[str, Any], email_data: Dict[str, Any]) -> None:
+    """Render the analysis results for one email."""
+    # Display results
+    st.header("📊 Analysis Results")
+    
+    # Risk banner
+    action = result.get('action', 'unknown').upper()
+    final_score = result.get('final_score', 0.0)
+    risk_color = get_risk_color(action)
+    
+    st.markdown(f"""
+    <div style="background-color: {risk_color}; color: white; padding: 20px; border-radius: 10px; text-align: center; margin: 20px 0;">
+        <h2 style="margin: 0; color: white;">🛡️ RISK ASSESSMENT: {action}</h2>
+        <h3 style="margin: 10px 0; color: white;">Overall Score: {final_score:.3f}</h3>
+        <p style="margin: 0; color: white;">{result.get('summary', '')}</p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    # Agent scores
+    st.subheader("🤖 Agent Scores")
+    
+    col1, col2, col3, col4, col5 = st.columns(5)
+    
+    with col1:
+        content_score = result.get('content_analysis', {}).get('score', 0.0)
+        st.markdown(create_progress_bar(content_score, "Content Agent", "#ff6b6b"), unsafe_allow_html=True)
+    
+    with col2:
+        link_score = result.get('link_analysis', {}).get('score', 0.0)
+        st.markdown(create_progress_bar(link_score, "Link Agent", "#42a5f5"), unsafe_allow_html=True)
+    
+    with col3:
+        behavior_score = result.get('behavior_analysis', {}).get('score', 0.0)
+        st.markdown(create_progress_bar(behavior_score, "Behavior Agent", "#66bb6a"), unsafe_allow_html=True)
+    
+    with col4:
+        header_score = result.get('header_analysis', {}).get('score', 0.0)
+        st.markdown(create_progress_bar(header_score, "Header Agent", "#9c27b0"), unsafe_allow_html=True)
+    
+    with col5:
+        qr_score = result.get('qr_analysis', {}).get('score', 0.0)
+        st.markdown(create_progress_bar(qr_score, "QR Code Agent", "#ff9800"), unsafe_allow_html=True)
+    
+    # Detailed analysis views. A radio rather than st.tabs, since tabs run
+    # every body on each rerun; this way only the selected view is built.
+    view = st.radio("View", _RESULT_VIEWS, horizontal=True, label_visibility="collapsed", key="results_view")
+    
+    if view == _RESULT_VIEWS[0]:
+        st.subheader("🔍 Content Analysis")
+        content_analysis = result.get('content_analysis', {})
+        
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            st.metric("Content Score", f"{content_analysis.get('score', 0.0):.3f}")
+        with col2:
+            highlights_count = len(content_analysis.get('highlights', []))
+            st.metric("Suspicious Elements", highlights_count)
+        
+        st.markdown("**Explanation:**")
+        st.write(content_analysis.get('explain', 'No explanation available'))
+        
+        # Highlighted content
+        if content_analysis.get('highlights'):
+            st.markdown("**Highlighted Text:**")
+            email_text = email_data.get('body_text', '')
+            highlighted = highlight_text(email_text, content_analysis.get('highlights', []))
+            st.markdown(f'<div style="border: 1px solid #ddd; padding: 15px; border-radius: 5px;">{highlighted}</div>', unsafe_allow_html=True)
+            
+            # Highlights details
+            with st.expander("🎯 View highlight details"):
+                # One markdown element for all entries rather than one per highlight
+                st.markdown("\n\n".join(
+                    f"**{i}.** `{highlight.get('token', '')}` - {highlight.get('reason', '')}"
+                    for i, highlight in enumerate(content_analysis.get('highlights', []), 1)
+                ))
+    
+    elif view == _RESULT_VIEWS[1]:
+        st.subheader("🔗 Link Analysis")
+        link_analysis = result.get('link_analysis', {})
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Link Score", f"{link_analysis.get('score', 0.0):.3f}")
+        with col2:
+            st.metric("Total Links", link_analysis.get('total_links', 0))
+        with col3:
+            st.metric("Suspicious Links", link_analysis.get('suspicious_count', 0))
+        
+        st.markdown("**Analysis:**")
+        st.write(link_analysis.get('details', 'No details available'))
+        
+        # Links table
+        if link_analysis.get('suspicious_links'):
+            st.markdown("**Suspicious Links Found:**")
+            display_links_table(link_analysis.get('suspicious_links', []))
+    
+    elif view == _RESULT_VIEWS[2]:
+        st.subheader("👤 Behavior Analysis")
+        behavior_analysis = result.get('behavior_analysis', {})
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Behavior Score", f"{behavior_analysis.get('score', 0.0):.3f}")
+        with col2:
+            reputation = behavior_analysis.get('sender_reputation', 'unknown')
+            st.metric("Sender Reputation", reputation.title())
+        
+        st.markdown("**Analysis:**")
+        st.write(behavior_analysis.get('details', 'No details available'))
+        
+        # Behavior issues
+        issues = [
+            ("Timing Anomalies", behavior_analysis.get('timing_anomalies', [])),
+            ("Header Anomalies", behavior_analysis.get('header_anomalies', [])),
+            ("Authentication Issues", behavior_analysis.get('authentication_issues', [])),
+            ("Spoofing Indicators", behavior_analysis.get('spoofing_indicators', []))
+        ]
+        
+        for category, items in issues:
+            if items:
+                st.markdown(f"**{category}:**")
+                for item in items:
+                    st.write(f"- {item}")
+    
+    elif view == _RESULT_VIEWS[3]:
+        st.subheader("📧 Header Analysis")
+        header_analysis = result.get('header_analysis', {})
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Header Score", f"{header_analysis.get('score', 0.0):.3f}")
+        with col2:
+            verdict = header_analysis.get('verdict', 'normal')
+            verdict_emoji = {
+                'normal': '🟢',
+                'identity mismatch': '🔴', 
+                'suspicious routing': '🟡'
+            }.get(verdict, '❓')
+            st.metric("Verdict", f"{verdict_emoji} {verdict.title()}")
+        with col3:
+            routing_analysis = header_analysis.get('routing_analysis')
+            if routing_analysis:
+                st.metric("Routing Hops", routing_analysis.get('total_hops', 0))
+            else:
+                st.metric("Routing Hops", "N/A")
+        
+        st.markdown("**Analysis:**")
+        st.write(header_analysis.get('details', 'No details available'))
+        
+        # Header issues
+        if header_analysis.get('reasons'):
+            st.markdown("**Key Issues:**")
+            for i, reason in enumerate(header_analysis.get('reasons', []), 1):
+                st.write(f"{i}. {reason}")
+        
+        # Routing analysis details
+        if routing_analysis:
+            with st.expander("🛣️ Routing Path Details"):
+                st.write(f"**Total Hops:** {routing_analysis.get('total_hops', 0)}")
+                if routing_analysis.get('origin_server'):
+                    st.write(f"**Origin Server:** {routing_analysis.get('origin_server')}")
+                if routing_analysis.get('origin_ip'):
+                    st.write(f"**Origin IP:** {routing_analysis.get('origin_ip')}")
+                if routing_analysis.get('final_server'):
+                    st.write(f"**Final Server:** {routing_analysis.get('final_server')}")
+                
+                if routing_analysis.get('suspicious_hops'):
+                    st.write(f"**Suspicious Servers:** {', '.join(routing_analysis.get('suspicious_hops', []))}")
+                
+                # Show routing path
+                route_hops = routing_analysis.get('route_hops', [])
+                if route_hops:
+                    st.write("**Routing Path:**")
+                    for i, hop in enumerate(route_hops, 1):
+                        server = hop.get('server', 'Unknown')
+                        ip = hop.get('ip_address', 'N/A')
+                        st.write(f"  {i}. {server} ({ip})")
+    
+    elif view == _RESULT_VIEWS[4]:
+        st.subheader("📱 QR Code Analysis")
+        qr_analysis = result.get('qr_analysis', {})
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("QR Code Score", f"{qr_analysis.get('score', 0.0):.3f}")
+        with col2:
+            st.metric("Total QR Codes", qr_analysis.get('total_qr_codes', 0))
+        with col3:
+            st.metric("Suspicious QR Codes", qr_analysis.get('suspicious_count', 0))
+        
+        st.markdown("**Analysis:**")
+        st.write(qr_analysis.get('details', 'No details available'))
+        
+        # QR codes table
+        if qr_analysis.get('qr_codes'):
+            st.markdown("**QR Codes Found:**")
+            display_qr_codes_table(qr_analysis.get('qr_codes', []))
+            
+            # QR codes details
+            with st.expander("🎯 View QR code details"):
+                qr_codes = qr_analysis.get('qr_codes', [])
+                st.dataframe({
+                    'Type': [qr_code.get('content_type', 'unknown') for qr_code in qr_codes],
+                    'Location': [qr_code.get('location', 'unknown') for qr_code in qr_codes],
+                    'Content': [qr_code.get('content', 'Unknown')[:100] for qr_code in qr_codes],
+                    'Reasons': ['; '.join(qr_code.get('reasons') or []) for qr_code in qr_codes]
+                }, use_container_width=True)
+    
+    elif view == _RESULT_VIEWS[5]:
+        st.subheader("📧 Original Email")
+        
+        # Email headers
+        with st.expander("📋 Email Headers"):
+            headers = email_data.get('headers', {})
+            if headers:
+                st.dataframe({
+                    'Header': list(headers),
+                    'Value': [str(value) for value in headers.values()]
+                }, use_container_width=True, hide_index=True)
+        
+        # Email body
+        st.markdown("**Email Body:**")
+        body_html = email_data.get('body_html')
+        if body_html and not st.toggle("Render HTML body", value=False,
+                                       help="Email HTML is shown in an isolated frame, mounted only on request"):
+            st.text_area("Email Text:", email_data.get('body_text', ''), height=300, disabled=True)
+        elif body_html:
+            # Wrap HTML in a container with proper styling for readability
+            st.components.v1.html(_HTML_WRAP_PRE + body_html + _HTML_WRAP_POST, height=300, scrolling=True)
+        else:
+            st.text_area("Email Text:", email_data.get('body_text', ''), height=300, disabled=True)
+
+@_fragment
+def render_feedback() -> None:
+    """Render the feedback form; a fragment of its own so submitting it doesn't rebuild the results."""
+    st.header("💬 Feedback")
+    
+    # A form so typing a comment doesn't rerun anything until a button is pressed
+    with st.form("feedback_form"):
+        col1, col2, col3 = st.columns([1, 1, 2])
+        
+        with col1:
+            correct = st.form_submit_button("👍 Correct Analysis", use_container_width=True)
+        
+        with col2:
+            incorrect = st.form_submit_button("👎 Incorrect Analysis", use_container_width=True)
+        
+        with col3:
+            feedback_text = st.text_input("Additional comments:", placeholder="Optional feedback...")
+        
+        if correct:
+            col1.success("Thank you for the feedback!")
+        if incorrect:
+            col2.error("Thank you for the feedback! This helps us improve.")
+        if (correct or incorrect) and feedback_text:
+            col3.info("Feedback recorded: " + feedback_text)
+
 def main():
     """Main Streamlit app."""
     
@@ -424,7 +788,7 @@ def main():
         # Demo dropdown
         demo_choice = st.selectbox(
             "Try a demo email:",
-            list(DEMO_EMAILS.keys()),
+            get_demo_names(),
             help="Select a pre-configured email example"
         )
         
@@ -435,18 +799,12 @@ def main():
         
         with tab1:
             if demo_choice != "Select a demo email...":
-                email_data = DEMO_EMAILS[demo_choice]
+                email_data = get_demo_emails()[demo_choice]
                 
                 # Show demo email in text area
-                demo_text = f"""Subject: {email_data.get('subject', '')}
-From: {email_data.get('from', '')}
-To: {email_data.get('to', '')}
-
-{email_data.get('body_text', '')}"""
-                
                 email_text = st.text_area(
                     "Email content:",
-                    value=demo_text,
+                    value=get_demo_texts()[demo_choice],
                     height=300,
                     help="Paste raw email content here"
                 )
@@ -459,7 +817,11 @@ To: {email_data.get('to', '')}
                 )
             
             if email_text and demo_choice == "Select a demo email...":
-                email_data = parse_email_text(email_text)
+                # Reparse only when the pasted text has changed since the last rerun
+                if st.session_state.get("_parsed_email_text") != email_text:
+                    st.session_state["parsed_email"] = parse_email_text(email_text)
+                    st.session_state["_parsed_email_text"] = email_text
+                email_data = st.session_state["parsed_email"]
         
         with tab2:
             uploaded_file = st.file_uploader(
@@ -470,9 +832,9 @@ To: {email_data.get('to', '')}
             
             if uploaded_file:
                 try:
-                    email_data = json.load(uploaded_file)
+                    email_data = _json_loads(uploaded_file.getvalue())
                     st.success("JSON file loaded successfully!")
-                except json.JSONDecodeError:
+                except json.JSONDecodeError:  # orjson.JSONDecodeError subclasses it
                     st.error("Invalid JSON file")
     
     with col2:
@@ -487,304 +849,41 @@ To: {email_data.get('to', '')}
         
         if email_data:
             st.success("✅ Email data loaded")
-            with st.expander("📋 View email data"):
-                st.json(email_data)
+            # Only serialize the data when asked; a collapsed expander still ships it
+            if st.toggle("📋 View email data", value=False):
+                st.json(_json_preview(email_data))
     
     # Analysis results
     if analyze_button and email_data:
         with st.spinner("🔍 Analyzing email..."):
             try:
-                # Make API request
-                response = requests.post(
-                    f"{api_url}/analyze_email",
-                    json=email_data,
-                    timeout=30
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    
-                    # Display results
-                    st.header("📊 Analysis Results")
-                    
-                    # Risk banner
-                    action = result.get('action', 'unknown').upper()
-                    final_score = result.get('final_score', 0.0)
-                    risk_color = get_risk_color(action)
-                    
-                    st.markdown(f"""
-                    <div style="background-color: {risk_color}; color: white; padding: 20px; border-radius: 10px; text-align: center; margin: 20px 0;">
-                        <h2 style="margin: 0; color: white;">🛡️ RISK ASSESSMENT: {action}</h2>
-                        <h3 style="margin: 10px 0; color: white;">Overall Score: {final_score:.3f}</h3>
-                        <p style="margin: 0; color: white;">{result.get('summary', '')}</p>
-                    </div>
-                    """, unsafe_allow_html=True)
-                    
-                    # Agent scores
-                    st.subheader("🤖 Agent Scores")
-                    
-                    col1, col2, col3, col4, col5 = st.columns(5)
-                    
-                    with col1:
-                        content_score = result.get('content_analysis', {}).get('score', 0.0)
-                        st.plotly_chart(
-                            create_progress_bar(content_score, "Content Agent", "#ff6b6b"),
-                            use_container_width=True,
-                            config={'displayModeBar': False}
-                        )
-                    
-                    with col2:
-                        link_score = result.get('link_analysis', {}).get('score', 0.0)
-                        st.plotly_chart(
-                            create_progress_bar(link_score, "Link Agent", "#42a5f5"),
-                            use_container_width=True,
-                            config={'displayModeBar': False}
-                        )
-                    
-                    with col3:
-                        behavior_score = result.get('behavior_analysis', {}).get('score', 0.0)
-                        st.plotly_chart(
-                            create_progress_bar(behavior_score, "Behavior Agent", "#66bb6a"),
-                            use_container_width=True,
-                            config={'displayModeBar': False}
-                        )
-                    
-                    with col4:
-                        header_score = result.get('header_analysis', {}).get('score', 0.0)
-                        st.plotly_chart(
-                            create_progress_bar(header_score, "Header Agent", "#9c27b0"),
-                            use_container_width=True,
-                            config={'displayModeBar': False}
-                        )
-                    
-                    with col5:
-                        qr_score = result.get('qr_analysis', {}).get('score', 0.0)
-                        st.plotly_chart(
-                            create_progress_bar(qr_score, "QR Code Agent", "#ff9800"),
-                            use_container_width=True,
-                            config={'displayModeBar': False}
-                        )
-                    
-                    # Detailed analysis tabs
-                    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(["📝 Content Analysis", "🔗 Link Analysis", "👤 Behavior Analysis", "📧 Header Analysis", "📱 QR Code Analysis", "📧 Original Email"])
-                    
-                    with tab1:
-                        st.subheader("🔍 Content Analysis")
-                        content_analysis = result.get('content_analysis', {})
-                        
-                        col1, col2 = st.columns([3, 1])
-                        with col1:
-                            st.metric("Content Score", f"{content_analysis.get('score', 0.0):.3f}")
-                        with col2:
-                            highlights_count = len(content_analysis.get('highlights', []))
-                            st.metric("Suspicious Elements", highlights_count)
-                        
-                        st.markdown("**Explanation:**")
-                        st.write(content_analysis.get('explain', 'No explanation available'))
-                        
-                        # Highlighted content
-                        if content_analysis.get('highlights'):
-                            st.markdown("**Highlighted Text:**")
-                            email_text = email_data.get('body_text', '')
-                            highlighted = highlight_text(email_text, content_analysis.get('highlights', []))
-                            st.markdown(f'<div style="border: 1px solid #ddd; padding: 15px; border-radius: 5px;">{highlighted}</div>', unsafe_allow_html=True)
-                            
-                            # Highlights details
-                            with st.expander("🎯 View highlight details"):
-                                for i, highlight in enumerate(content_analysis.get('highlights', []), 1):
-                                    st.write(f"**{i}.** `{highlight.get('token', '')}` - {highlight.get('reason', '')}")
-                    
-                    with tab2:
-                        st.subheader("🔗 Link Analysis")
-                        link_analysis = result.get('link_analysis', {})
-                        
-                        col1, col2, col3 = st.columns(3)
-                        with col1:
-                            st.metric("Link Score", f"{link_analysis.get('score', 0.0):.3f}")
-                        with col2:
-                            st.metric("Total Links", link_analysis.get('total_links', 0))
-                        with col3:
-                            st.metric("Suspicious Links", link_analysis.get('suspicious_count', 0))
-                        
-                        st.markdown("**Analysis:**")
-                        st.write(link_analysis.get('details', 'No details available'))
-                        
-                        # Links table
-                        if link_analysis.get('suspicious_links'):
-                            st.markdown("**Suspicious Links Found:**")
-                            display_links_table(link_analysis.get('suspicious_links', []))
-                    
-                    with tab3:
-                        st.subheader("👤 Behavior Analysis")
-                        behavior_analysis = result.get('behavior_analysis', {})
-                        
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            st.metric("Behavior Score", f"{behavior_analysis.get('score', 0.0):.3f}")
-                        with col2:
-                            reputation = behavior_analysis.get('sender_reputation', 'unknown')
-                            st.metric("Sender Reputation", reputation.title())
-                        
-                        st.markdown("**Analysis:**")
-                        st.write(behavior_analysis.get('details', 'No details available'))
-                        
-                        # Behavior issues
-                        issues = [
-                            ("Timing Anomalies", behavior_analysis.get('timing_anomalies', [])),
-                            ("Header Anomalies", behavior_analysis.get('header_anomalies', [])),
-                            ("Authentication Issues", behavior_analysis.get('authentication_issues', [])),
-                            ("Spoofing Indicators", behavior_analysis.get('spoofing_indicators', []))
-                        ]
-                        
-                        for category, items in issues:
-                            if items:
-                                st.markdown(f"**{category}:**")
-                                for item in items:
-                                    st.write(f"- {item}")
-                    
-                    with tab4:
-                        st.subheader("📧 Header Analysis")
-                        header_analysis = result.get('header_analysis', {})
-                        
-                        col1, col2, col3 = st.columns(3)
-                        with col1:
-                            st.metric("Header Score", f"{header_analysis.get('score', 0.0):.3f}")
-                        with col2:
-                            verdict = header_analysis.get('verdict', 'normal')
-                            verdict_emoji = {
-                                'normal': '🟢',
-                                'identity mismatch': '🔴', 
-                                'suspicious routing': '🟡'
-                            }.get(verdict, '❓')
-                            st.metric("Verdict", f"{verdict_emoji} {verdict.title()}")
-                        with col3:
-                            routing_analysis = header_analysis.get('routing_analysis')
-                            if routing_analysis:
-                                st.metric("Routing Hops", routing_analysis.get('total_hops', 0))
-                            else:
-                                st.metric("Routing Hops", "N/A")
-                        
-                        st.markdown("**Analysis:**")
-                        st.write(header_analysis.get('details', 'No details available'))
-                        
-                        # Header issues
-                        if header_analysis.get('reasons'):
-                            st.markdown("**Key Issues:**")
-                            for i, reason in enumerate(header_analysis.get('reasons', []), 1):
-                                st.write(f"{i}. {reason}")
-                        
-                        # Routing analysis details
-                        if routing_analysis:
-                            with st.expander("🛣️ Routing Path Details"):
-                                st.write(f"**Total Hops:** {routing_analysis.get('total_hops', 0)}")
-                                if routing_analysis.get('origin_server'):
-                                    st.write(f"**Origin Server:** {routing_analysis.get('origin_server')}")
-                                if routing_analysis.get('origin_ip'):
-                                    st.write(f"**Origin IP:** {routing_analysis.get('origin_ip')}")
-                                if routing_analysis.get('final_server'):
-                                    st.write(f"**Final Server:** {routing_analysis.get('final_server')}")
-                                
-                                if routing_analysis.get('suspicious_hops'):
-                                    st.write(f"**Suspicious Servers:** {', '.join(routing_analysis.get('suspicious_hops', []))}")
-                                
-                                # Show routing path
-                                route_hops = routing_analysis.get('route_hops', [])
-                                if route_hops:
-                                    st.write("**Routing Path:**")
-                                    for i, hop in enumerate(route_hops, 1):
-                                        server = hop.get('server', 'Unknown')
-                                        ip = hop.get('ip_address', 'N/A')
-                                        st.write(f"  {i}. {server} ({ip})")
-                    
-                    with tab5:
-                        st.subheader("📱 QR Code Analysis")
-                        qr_analysis = result.get('qr_analysis', {})
-                        
-                        col1, col2, col3 = st.columns(3)
-                        with col1:
-                            st.metric("QR Code Score", f"{qr_analysis.get('score', 0.0):.3f}")
-                        with col2:
-                            st.metric("Total QR Codes", qr_analysis.get('total_qr_codes', 0))
-                        with col3:
-                            st.metric("Suspicious QR Codes", qr_analysis.get('suspicious_count', 0))
-                        
-                        st.markdown("**Analysis:**")
-                        st.write(qr_analysis.get('details', 'No details available'))
-                        
-                        # QR codes table
-                        if qr_analysis.get('qr_codes'):
-                            st.markdown("**QR Codes Found:**")
-                            display_qr_codes_table(qr_analysis.get('qr_codes', []))
-                            
-                            # QR codes details
-                            with st.expander("🎯 View QR code details"):
-                                for i, qr_code in enumerate(qr_analysis.get('qr_codes', []), 1):
-                                    st.write(f"**{i}.** Type: `{qr_code.get('content_type', 'unknown')}` - Location: `{qr_code.get('location', 'unknown')}`")
-                                    st.write(f"   Content: {qr_code.get('content', 'Unknown')[:100]}")
-                                    if qr_code.get('reasons'):
-                                        st.write(f"   Reasons: {'; '.join(qr_code.get('reasons', []))}")
-                                    st.write("")
-                    
-                    with tab6:
-                        st.subheader("📧 Original Email")
-                        
-                        # Email headers
-                        with st.expander("📋 Email Headers"):
-                            headers = email_data.get('headers', {})
-                            for key, value in headers.items():
-                                st.write(f"**{key}:** {value}")
-                        
-                        # Email body
-                        st.markdown("**Email Body:**")
-                        if email_data.get('body_html'):
-                            # Wrap HTML in a container with proper styling for readability
-                            wrapped_html = f"""
-                            <div style="
-                                background-color: white; 
-                                color: black; 
-                                padding: 15px; 
-                                border: 1px solid #ddd; 
-                                border-radius: 5px;
-                                font-family: Arial, sans-serif;
-                                line-height: 1.6;
-                                max-width: 100%;
-                                overflow-wrap: break-word;
-                            ">
-                                {email_data['body_html']}
-                            </div>
-                            """
-                            st.components.v1.html(wrapped_html, height=300, scrolling=True)
-                        else:
-                            st.text_area("Email Text:", email_data.get('body_text', ''), height=300, disabled=True)
-                    
-                    # Feedback section
-                    st.header("💬 Feedback")
-                    
-                    col1, col2, col3 = st.columns([1, 1, 2])
-                    
-                    with col1:
-                        if st.button("👍 Correct Analysis", use_container_width=True):
-                            st.success("Thank you for the feedback!")
-                    
-                    with col2:
-                        if st.button("👎 Incorrect Analysis", use_container_width=True):
-                            st.error("Thank you for the feedback! This helps us improve.")
-                    
-                    with col3:
-                        feedback_text = st.text_input("Additional comments:", placeholder="Optional feedback...")
-                        if feedback_text:
-                            st.info("Feedback recorded: " + feedback_text)
-                
-                else:
-                    st.error(f"API Error: {response.status_code} - {response.text}")
-                    
+                # Make API request; repeat analyses of the same email are served from cache
+                result = analyze_email_cached(api_url, _json_dumps_sorted(email_data))
+                st.session_state["last_analysis"] = (email_data, result)
+            
+            except APIError as e:
+                st.session_state.pop("last_analysis", None)
+                st.error(f"API Error: {e.status_code} - {e.text}")
+            
             except requests.exceptions.RequestException as e:
+                st.session_state.pop("last_analysis", None)
                 st.error(f"Connection Error: Could not connect to API at {api_url}")
                 st.error(f"Error details: {str(e)}")
                 st.info("Make sure the FastAPI backend is running at the specified URL")
             
             except Exception as e:
+                st.session_state.pop("last_analysis", None)
                 st.error(f"Unexpected error: {str(e)}")
+    
+    # Keep showing the last analysis across reruns (e.g. feedback clicks)
+    # for as long as the same email is loaded
+    last_analysis = st.session_state.get("last_analysis")
+    if last_analysis is not None and last_analysis[0] == email_data:
+        try:
+            render_results(*last_analysis)
+            render_feedback()
+        except Exception as e:
+            st.error(f"Unexpected error: {str(e)}")
 
 if __name__ == "__main__":
     main()
@@ -5,6 +5,7 @@ Test script for the enhanced content agent.
 
 import asyncio
 from agents.content_agent import analyze_content
+from test_helpers import risk_label
 
 async def test_content_agent():
     """Test the enhanced content agent with sample emails."""
@@ -36,14 +37,16 @@ async def test_content_agent():
     print("Testing Enhanced Content Agent")
     print("=" * 50)
     
-    for test_case in test_cases:
+    # Analyze all cases concurrently; results come back in input order
+    results = await asyncio.gather(*(
+        analyze_content(test_case['body'], test_case['subject']) for test_case in test_cases
+    ))
+    
+    for test_case, result in zip(test_cases, results):
         print(f"\n🧪 Test: {test_case['name']}")
         print(f"Subject: {test_case['subject']}")
         print(f"Body: {test_case['body'][:100]}...")
         
-        # Analyze the content
-        result = await analyze_content(test_case['body'], test_case['subject'])
-        
         print(f"\n📊 Results:")
         print(f"  Score: {result['score']:.3f}")
         print(f"  Explanation: {result['explain']}")
@@ -56,16 +59,7 @@ async def test_content_agent():
             print("  No highlights found")
         
         # Risk assessment
-        if result['score'] >= 0.8:
-            risk = "🔴 HIGH RISK"
-        elif result['score'] >= 0.5:
-            risk = "🟡 MEDIUM RISK"
-        elif result['score'] >= 0.3:
-            risk = "🟠 LOW RISK"
-        else:
-            risk = "🟢 SAFE"
-        
-        print(f"  Assessment: {risk}")
+        print(f"  Assessment: {risk_label(result['score'])}")
         print("-" * 50)
 
 if __name__ == "__main__":
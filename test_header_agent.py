@@ -5,6 +5,10 @@ Test script for the enhanced header agent.
 
 import asyncio
 from agents.header_agent import analyze_headers, EnhancedHeaderAgent
+from test_helpers import risk_label
+
+# One agent shared by the helper-level tests; it keeps no per-call state
+_HEADER_AGENT = EnhancedHeaderAgent()
 
 async def test_header_agent():
     """Test the enhanced header agent with various header scenarios."""
@@ -146,7 +150,10 @@ async def test_header_agent():
     print("Testing Enhanced Header Agent")
     print("=" * 70)
     
-    for i, test_case in enumerate(test_cases, 1):
+    # Analyze all cases concurrently; results come back in input order
+    results = await asyncio.gather(*(analyze_headers(test_case['headers']) for test_case in test_cases))
+    
+    for i, (test_case, result) in enumerate(zip(test_cases, results), 1):
         print(f"\n🧪 Test {i}: {test_case['name']}")
         
         # Show key header info
@@ -158,9 +165,6 @@ async def test_header_agent():
         print(f"Subject: {subject}")
         print(f"Routing Hops: {received_count}")
         
-        # Analyze headers
-        result = await analyze_headers(test_case['headers'])
-        
         print(f"\n📊 Results:")
         print(f"  Score: {result['score']:.3f}")
         print(f"  Verdict: {result['verdict']}")
@@ -184,16 +188,7 @@ async def test_header_agent():
                 print(f"  Suspicious Servers: {', '.join(routing.suspicious_hops)}")
         
         # Risk assessment
-        if result['score'] >= 0.8:
-            risk = "🔴 HIGH RISK"
-        elif result['score'] >= 0.5:
-            risk = "🟡 MEDIUM RISK"
-        elif result['score'] >= 0.3:
-            risk = "🟠 LOW RISK"
-        else:
-            risk = "🟢 SAFE"
-        
-        print(f"  Assessment: {risk}")
+        print(f"  Assessment: {risk_label(result['score'])}")
         print("-" * 70)
 
 async def test_routing_path_parsing():
@@ -201,7 +196,7 @@ async def test_routing_path_parsing():
     print("\n🧪 Testing Routing Path Parsing")
     print("=" * 50)
     
-    agent = EnhancedHeaderAgent()
+    agent = _HEADER_AGENT
     
     # Test complex Received headers
     test_headers = {
@@ -231,7 +226,7 @@ async def test_domain_extraction():
     print("\n🧪 Testing Domain Extraction")
     print("=" * 40)
     
-    agent = EnhancedHeaderAgent()
+    agent = _HEADER_AGENT
     
     test_cases = [
         "john.doe@gmail.com",
@@ -252,7 +247,7 @@ async def test_authentication_checks():
     print("\n🧪 Testing Authentication Analysis")
     print("=" * 45)
     
-    agent = EnhancedHeaderAgent()
+    agent = _HEADER_AGENT
     
     test_cases = [
         {
@@ -302,7 +297,7 @@ async def test_verdict_determination():
     print("\n🧪 Testing Verdict Determination")
     print("=" * 40)
     
-    agent = EnhancedHeaderAgent()
+    agent = _HEADER_AGENT
     
     test_cases = [
         {
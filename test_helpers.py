@@ -0,0 +1,14 @@
+"""
+Shared helpers for the agent test scripts.
+"""
+
+from bisect import bisect_right
+
+# Score thresholds and the assessment label for each band between them
+_RISK_THRESHOLDS = (0.3, 0.5, 0.8)
+_RISK_LABELS = ("🟢 SAFE", "🟠 LOW RISK", "🟡 MEDIUM RISK", "🔴 HIGH RISK")
+
+
+def risk_label(score: float) -> str:
+    """Assessment label for an agent score."""
+    return _RISK_LABELS[bisect_right(_RISK_THRESHOLDS, score)]
@@ -4,7 +4,40 @@ Test script for the enhanced orchestrator with sample agent outputs.
 """
 
 import asyncio
-from orchestrator import orchestrate, generate_summary, OrchestrationConfig, OrchestrationResult
+import random
+from orchestrator import (
+    orchestrate, orchestrate_batch, orchestrate_configs, generate_summary, OrchestrationConfig, OrchestrationResult,
+    EmailAnalysisOrchestrator
+)
+from agents.behavior_agent import create_email_store
+
+# Plain emails with nothing for the link or QR agents to scan
+PLAIN_EMAILS = [
+    {
+        "subject": "Team meeting tomorrow",
+        "from": "alice@company.com",
+        "to": "team@company.com",
+        "body_html": "",
+        "body_text": "Hi all, the weekly meeting is at 2 PM in Conference Room A.",
+        "headers": {"From": "alice@company.com", "To": "team@company.com"},
+        "links": []
+    },
+    {
+        "subject": "Lunch order",
+        "from": "bob@company.com",
+        "to": "team@company.com",
+        "body_html": "",
+        "body_text": "Please send me your lunch orders by 11.",
+        "headers": {"From": "bob@company.com", "To": "team@company.com"},
+        "links": []
+    }
+]
+
+def _legacy_orchestrator():
+    """Legacy orchestrator whose behavior history lives in memory, not the shared DB."""
+    orchestrator = EmailAnalysisOrchestrator()
+    orchestrator.behavior_agent.store = create_email_store("sqlite", db_path=":memory:")
+    return orchestrator
 
 async def test_orchestrator():
     """Test orchestrator with various combinations of agent outputs."""
@@ -71,6 +104,12 @@ async def test_orchestrator():
                     "last_seen": "2024-10-21T10:15:00"
                 },
                 "details": "Minor behavioral inconsistencies detected. Sender has 2 previous messages"
+            },
+            "header_out": {
+                "score": 0.5,
+                "verdict": "normal",
+                "reasons": ["Reply-To domain differs from From domain"],
+                "details": "Minor header inconsistencies detected"
             }
         },
         {
@@ -165,10 +204,15 @@ async def test_orchestrator():
                 "sender_history": {"is_new_sender": False, "message_count": 10},
                 "details": "No behavioral anomalies"
             },
-            "custom_config": OrchestrationConfig(content_weight=0.8, link_weight=0.1, behavior_weight=0.1)
+            "custom_config": OrchestrationConfig(content_weight=0.8, link_weight=0.1, behavior_weight=0.1,
+                                                 header_weight=0.0, qr_weight=0.0)
         }
     ]
     
+    # Header and QR outputs for cases that don't set their own
+    default_header_out = {"score": 0.0, "verdict": "normal", "reasons": [], "details": "No header anomalies"}
+    default_qr_out = {"score": 0.0, "qr_codes": [], "suspicious_count": 0, "details": "No QR codes"}
+    
     for i, test_case in enumerate(test_cases, 1):
         print(f"\n🧪 Test {i}: {test_case['name']}")
         print("-" * 40)
@@ -178,7 +222,7 @@ async def test_orchestrator():
         if config:
             print(f"Custom weights: Content={config.content_weight}, Link={config.link_weight}, Behavior={config.behavior_weight}")
         else:
-            print("Default weights: Content=0.5, Link=0.3, Behavior=0.2")
+            print("Default weights: Content=0.3, Link=0.2, Behavior=0.2, Header=0.2, QR=0.1")
         
         # Show input scores
         content_score = test_case['content_out']['score']
@@ -191,10 +235,12 @@ async def test_orchestrator():
         print(f"  Behavior: {behavior_score:.2f}")
         
         # Run orchestration
-        result = await orchestrate(
+        result = orchestrate(
             test_case['content_out'],
             test_case['link_out'], 
             test_case['behavior_out'],
+            test_case.get('header_out', default_header_out),
+            test_case.get('qr_out', default_qr_out),
             config
         )
         
@@ -207,8 +253,8 @@ async def test_orchestrator():
         print(f"  {result.summary}")
         
         print(f"\n🔍 Top Reasons:")
-        for j, reason in enumerate(result.detailed_reasons[:3], 1):
-            print(f"  {j}. {reason['text']} (priority: {reason['priority']:.2f})")
+        for j, reason in enumerate(result.top_reasons(3), 1):
+            print(f"  {j}. {reason.text} (priority: {reason.priority:.2f})")
         
         # Show expected vs actual action
         expected_actions = {
@@ -233,20 +279,24 @@ async def test_edge_cases():
     
     # Test with missing data
     print("\n1. Missing Data Test:")
-    result = await orchestrate(
+    result = orchestrate(
         {"score": 0.5},  # Missing explain and highlights
         {"score": 0.3},  # Missing links data
-        {"score": 0.7}   # Missing reasons
+        {"score": 0.7},  # Missing reasons
+        {"score": 0.0},  # Missing verdict
+        {"score": 0.0}   # Missing QR codes
     )
     print(f"  Score: {result.final_score:.2f}, Action: {result.action}")
     print(f"  Summary: {result.summary}")
     
     # Test with zero scores
     print("\n2. All Zero Scores Test:")
-    result = await orchestrate(
+    result = orchestrate(
         {"score": 0.0, "highlights": [], "explain": "Clean content"},
         {"score": 0.0, "links": [], "total_links": 0, "suspicious_count": 0, "details": "No links"},
-        {"score": 0.0, "reasons": [], "sender_history": {"is_new_sender": False}, "details": "Normal behavior"}
+        {"score": 0.0, "reasons": [], "sender_history": {"is_new_sender": False}, "details": "Normal behavior"},
+        {"score": 0.0, "verdict": "normal", "reasons": [], "details": "Normal headers"},
+        {"score": 0.0, "qr_codes": [], "suspicious_count": 0, "details": "No QR codes"}
     )
     print(f"  Score: {result.final_score:.2f}, Action: {result.action}")
     print(f"  Summary: {result.summary}")
@@ -261,10 +311,12 @@ async def test_edge_cases():
     
     # Test with extreme scores
     print("\n4. Extreme Scores Test:")
-    result = await orchestrate(
+    result = orchestrate(
         {"score": 1.0, "highlights": [{"token": "URGENT!!!", "reason": "extreme"}], "explain": "Maximum suspicion"},
         {"score": 1.0, "links": [{"score": 1.0, "reasons": ["Everything wrong"]}], "total_links": 1, "suspicious_count": 1, "details": "All links suspicious"},
-        {"score": 1.0, "reasons": ["All red flags"], "sender_history": {"is_new_sender": True}, "details": "Maximum behavior suspicion"}
+        {"score": 1.0, "reasons": ["All red flags"], "sender_history": {"is_new_sender": True}, "details": "Maximum behavior suspicion"},
+        {"score": 1.0, "verdict": "identity mismatch", "reasons": ["From domain mismatch"], "details": "Maximum header suspicion"},
+        {"score": 1.0, "qr_codes": [], "suspicious_count": 1, "details": "Suspicious QR code"}
     )
     print(f"  Score: {result.final_score:.2f}, Action: {result.action}")
     print(f"  Confidence: {result.confidence:.2f}")
@@ -279,25 +331,199 @@ async def test_weight_sensitivity():
     content_out = {"score": 0.8, "highlights": [], "explain": "High content risk"}
     link_out = {"score": 0.2, "links": [], "total_links": 0, "suspicious_count": 0, "details": "Low link risk"}
     behavior_out = {"score": 0.1, "reasons": [], "sender_history": {"is_new_sender": False}, "details": "Low behavior risk"}
+    header_out = {"score": 0.1, "verdict": "normal", "reasons": [], "details": "Low header risk"}
+    qr_out = {"score": 0.0, "qr_codes": [], "suspicious_count": 0, "details": "No QR codes"}
     
     weight_configs = [
-        ("Content Heavy", OrchestrationConfig(0.8, 0.1, 0.1)),
-        ("Link Heavy", OrchestrationConfig(0.1, 0.8, 0.1)),
-        ("Behavior Heavy", OrchestrationConfig(0.1, 0.1, 0.8)),
-        ("Balanced", OrchestrationConfig(0.33, 0.33, 0.34)),
+        ("Content Heavy", OrchestrationConfig(0.6, 0.1, 0.1, 0.1, 0.1)),
+        ("Link Heavy", OrchestrationConfig(0.1, 0.6, 0.1, 0.1, 0.1)),
+        ("Behavior Heavy", OrchestrationConfig(0.1, 0.1, 0.6, 0.1, 0.1)),
+        ("Balanced", OrchestrationConfig(0.2, 0.2, 0.2, 0.2, 0.2)),
         ("Default", None)
     ]
     
-    for name, config in weight_configs:
-        result = await orchestrate(content_out, link_out, behavior_out, config)
-        weights_str = f"{config.content_weight:.1f}/{config.link_weight:.1f}/{config.behavior_weight:.1f}" if config else "0.5/0.3/0.2"
+    # Score every configuration in one call
+    results = orchestrate_configs(
+        content_out, link_out, behavior_out, header_out, qr_out,
+        [config for _, config in weight_configs]
+    )
+    
+    for (name, config), result in zip(weight_configs, results):
+        config = config or OrchestrationConfig()
+        weights_str = (f"{config.content_weight:.1f}/{config.link_weight:.1f}/{config.behavior_weight:.1f}/"
+                       f"{config.header_weight:.1f}/{config.qr_weight:.1f}")
         print(f"  {name} ({weights_str}): Score={result.final_score:.2f}, Action={result.action}")
+        
+        # Each result must match a single orchestrate() call with that config
+        expected = orchestrate(content_out, link_out, behavior_out, header_out, qr_out, config)
+        matches = (
+            result.final_score == expected.final_score and
+            result.action == expected.action and
+            result.confidence == expected.confidence and
+            result.summary == expected.summary
+        )
+        print(f"    {'✅' if matches else '❌'} Matches orchestrate()")
+
+def _random_outs(rng):
+    """One email's agent outputs with scores spread across every threshold."""
+    link_score = rng.random()
+    header_score = rng.random()
+    qr_score = rng.random()
+    return (
+        {"score": rng.random(), "highlights": [{"token": "urgent", "reason": "suspicious_keyword"}] * rng.randint(0, 3),
+         "explain": "Content check"},
+        {"score": link_score, "links": [{"score": link_score, "reasons": ["Uses IP address instead of domain"]}],
+         "total_links": 1, "suspicious_count": int(link_score >= 0.5), "details": "Link check"},
+        {"score": rng.random(), "reasons": ["New sender"], "sender_history": {"is_new_sender": True},
+         "details": "Behavior check"},
+        {"score": header_score, "verdict": rng.choice(["normal", "identity mismatch", "suspicious routing"]),
+         "reasons": ["Header check"], "details": "Header check"},
+        {"score": qr_score, "qr_codes": [], "total_qr_codes": 1, "suspicious_count": int(qr_score >= 0.5),
+         "details": "QR check"}
+    )
+
+async def test_batch_orchestration():
+    """orchestrate_batch matches one orchestrate() call per email."""
+    
+    print("\n🧪 Testing Batch Orchestration")
+    print("=" * 40)
+    
+    rng = random.Random(42)
+    outs_list = [_random_outs(rng) for _ in range(500)]
+    
+    for name, config in [("Default", None), ("Content Heavy", OrchestrationConfig(0.6, 0.1, 0.1, 0.1, 0.1))]:
+        results = orchestrate_batch(outs_list, config)
+        mismatches = 0
+        for outs, result in zip(outs_list, results):
+            expected = orchestrate(*outs, config)
+            if (result.final_score != expected.final_score or
+                    result.action != expected.action or
+                    result.confidence != expected.confidence or
+                    result.summary != expected.summary or
+                    result.detailed_reasons != expected.detailed_reasons):
+                mismatches += 1
+        status = "✅" if len(results) == len(outs_list) and mismatches == 0 else "❌"
+        print(f"  {status} {name}: {len(results)} results, {mismatches} differ from orchestrate()")
+    
+    status = "✅" if orchestrate_batch([]) == [] else "❌"
+    print(f"  {status} Empty batch returns no results")
+
+async def test_skipped_agents():
+    """Skipped link and QR agents yield fresh empty results for every email."""
+    
+    print("\n🧪 Testing Skipped Agents")
+    print("=" * 40)
+    
+    orchestrator = _legacy_orchestrator()
+    first, second = [await orchestrator.analyze_email(email) for email in PLAIN_EMAILS]
+    
+    empty = first.link_analysis['total_links'] == 0 and first.qr_analysis['total_qr_codes'] == 0
+    print(f"  {'✅' if empty else '❌'} No links or QR codes reported")
+    
+    # Mutating one response must not leak into another
+    first.link_analysis['suspicious_links'].append("http://example.com")
+    first.qr_analysis['qr_codes'].append({})
+    isolated = not second.link_analysis['suspicious_links'] and not second.qr_analysis['qr_codes']
+    print(f"  {'✅' if isolated else '❌'} Responses don't share empty results")
+    
+    await orchestrator.behavior_agent.store.close()
+
+class _FailingAgent:
+    """Agent stand-in whose analysis always raises."""
+    
+    async def analyze(self, email_data):
+        raise RuntimeError("agent unavailable")
+
+async def test_response_cache():
+    """Cached responses are keyed unambiguously, copied out, and never hold fallbacks."""
+    
+    print("\n🧪 Testing Response Cache")
+    print("=" * 40)
+    
+    orchestrator = _legacy_orchestrator()
+    email = PLAIN_EMAILS[0]
+    
+    # Field separators inside attacker-controlled fields can't collide keys
+    split_a = dict(email, subject="Team\0alice@company.com", **{"from": ""})
+    split_b = dict(email, subject="Team", **{"from": "alice@company.com"})
+    links_a = dict(email, links=["http://a.example|http://b.example"])
+    links_b = dict(email, links=["http://a.example", "http://b.example"])
+    distinct = (
+        orchestrator._cache_key(split_a) != orchestrator._cache_key(split_b) and
+        orchestrator._cache_key(links_a) != orchestrator._cache_key(links_b)
+    )
+    print(f"  {'✅' if distinct else '❌'} Distinct emails get distinct cache keys")
+    
+    # A failed agent's fallback result is not cached
+    header_agent = orchestrator.header_agent
+    orchestrator.header_agent = _FailingAgent()
+    failed = await orchestrator.analyze_email(email)
+    orchestrator.header_agent = header_agent
+    not_cached = failed.header_analysis['details'].startswith("Header analysis failed") and not orchestrator._response_cache
+    print(f"  {'✅' if not_cached else '❌'} Fallback results are not cached")
+    
+    # A repeat is served from the cache, as a copy the caller may change
+    first = await orchestrator.analyze_email(email)
+    highlights_count = len(first.content_analysis['highlights'])
+    first.content_analysis['highlights'].append({"token": "changed"})
+    second = await orchestrator.analyze_email(email)
+    third = await orchestrator.analyze_email(email)
+    copied = (
+        len(orchestrator._response_cache) == 1 and
+        len(second.content_analysis['highlights']) == highlights_count and
+        second is not third and second == third
+    )
+    print(f"  {'✅' if copied else '❌'} Cache hits are independent copies")
+    
+    await orchestrator.behavior_agent.store.close()
+
+async def test_analyze_batch():
+    """analyze_batch yields every email once, matching individual analyze_email calls."""
+    
+    print("\n🧪 Testing Batch Analysis")
+    print("=" * 40)
+    
+    # Distinct senders, so behavior history doesn't depend on completion order
+    emails = PLAIN_EMAILS + [{
+        "subject": "URGENT: Verify your account",
+        "from": "security@paypa1-support.com",
+        "to": "user@company.com",
+        "body_html": "",
+        "body_text": "Your account will be suspended. Verify now at http://192.168.1.100/login",
+        "headers": {"From": "security@paypa1-support.com", "To": "user@company.com"},
+        "links": ["http://192.168.1.100/login"]
+    }]
+    
+    batch_orchestrator = _legacy_orchestrator()
+    batch_results = {}
+    async for index, response in batch_orchestrator.analyze_batch(emails, max_concurrency=2):
+        batch_results[index] = response
+    print(f"  {'✅' if sorted(batch_results) == list(range(len(emails))) else '❌'} "
+          f"Yielded {len(batch_results)}/{len(emails)} emails")
+    
+    single_orchestrator = _legacy_orchestrator()
+    for index, email in enumerate(emails):
+        expected = await single_orchestrator.analyze_email(email)
+        response = batch_results.get(index)
+        matches = response is not None and (
+            response.final_score == expected.final_score and
+            response.action == expected.action and
+            response.summary == expected.summary
+        )
+        print(f"  {'✅' if matches else '❌'} Email {index}: {expected.action}, matches analyze_email")
+    
+    await batch_orchestrator.behavior_agent.store.close()
+    await single_orchestrator.behavior_agent.store.close()
 
 async def main():
     """Run all orchestrator tests."""
     await test_orchestrator()
     await test_edge_cases()
     await test_weight_sensitivity()
+    await test_batch_orchestration()
+    await test_skipped_agents()
+    await test_response_cache()
+    await test_analyze_batch()
     
     print("\n✅ All orchestrator tests completed!")
 